@@ -23,25 +23,49 @@ dataset_j/
 ├── horses
 └── human
 とする
+
+変換済みの画像 (1_dataset_name_cut.py で数字だけの名前にしたものを含む) が
+元の画像より新しければ変換しません。
+data/ から消した画像は dataset_j からも消えます。
 """
 import os
+import re
+import sys
 from PIL import Image
-import shutil
+import config
+import perf_metrics as pm
 
 # --- 設定 ---
-SOURCE_ROOT = "data"     # 変換したい画像ファイルがあるルートフォルダ
-TARGET_ROOT = "dataset_j" # 変換後のJPEGファイルを保存するルートフォルダ
+SOURCE_ROOT = config.DATA_DIR  # 変換したい画像ファイルがあるルートフォルダ
+TARGET_ROOT = config.JPEG_DIR  # 変換後のJPEGファイルを保存するルートフォルダ
 
-# 処理対象とするサブディレクトリ名（クラス名）のリスト
+# 処理対象とするサブディレクトリ名（クラス名）のリスト (config.py で設定)
 # フォルダ名が正確にこれと一致していることを確認してください
-CLASSES = ['bike', 'cars', 'cats', 'dogs', 'flowers', 'horses', 'human']
+# python 0_data2jpeg.py bike cars のようにクラスを指定するとそのクラスだけ処理します
+CLASSES = config.CLASSES
 
 # JPEG変換時に画質を調整（1〜100、高いほど高画質/ファイルサイズ大）
 JPEG_QUALITY = 90
 
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp']
+
 # --- メイン処理 ---
 
-def convert_categorized_images_to_jpg():
+def renamed(name):
+    """1_dataset_name_cut.py でリネームした後の名前 (拡張子なし)"""
+    match = re.search(r'([a-zA-Z_]+)?(\d+)', name)
+    return match.group(2) if match else name
+
+
+def up_to_date(path, source_mtime):
+    """path が元の画像より新しければ True"""
+    try:
+        return os.path.getmtime(path) >= source_mtime
+    except OSError:
+        return False
+
+
+def convert_categorized_images_to_jpg(classes=CLASSES):
     """
     クラスディレクトリ構造を維持したまま、画像をJPEG形式に変換します。
     """
@@ -51,22 +75,25 @@ def convert_categorized_images_to_jpg():
     
     total_converted_count = 0
     total_skipped_count = 0
+    total_unchanged_count = 0
+    total_removed_count = 0
     
     if not os.path.exists(SOURCE_ROOT):
         print(f"❌ エラー: ソースディレクトリ '{SOURCE_ROOT}' が見つかりません。プログラムを終了します。")
         return
 
-    for class_name in CLASSES:
+    for class_name in classes:
         source_dir = os.path.join(SOURCE_ROOT, class_name)
         target_dir = os.path.join(TARGET_ROOT, class_name)
         
-        # ターゲットディレクトリの作成
         os.makedirs(target_dir, exist_ok=True)
         
         print(f"\n--- クラス '{class_name}' の処理を開始 ---")
         
         converted_count = 0
         skipped_count = 0
+        unchanged_count = 0
+        wanted = set()  # 元の画像がある出力ファイル名
 
         if not os.path.exists(source_dir):
             print(f"⚠️ 警告: クラスフォルダ '{source_dir}' が見つかりません。スキップします。")
@@ -83,20 +110,37 @@ def convert_categorized_images_to_jpg():
             ext = ext.lower()
             
             # 処理対象の画像形式をチェック
-            if ext in ['.jpg', '.jpeg', '.png', '.bmp']:
+            if ext in IMAGE_EXTENSIONS:
                 # 出力ファイル名：拡張子を強制的に .jpg に設定
                 output_path = os.path.join(target_dir, name + ".jpg") 
+                # 1_dataset_name_cut.py でリネームされた後の出力
+                final_path = os.path.join(target_dir, renamed(name) + ".jpg")
+                wanted.update([os.path.basename(output_path), os.path.basename(final_path)])
+                
+                # 変換済みで元の画像が変わっていなければ何もしない
+                source_mtime = os.path.getmtime(input_path)
+                if up_to_date(output_path, source_mtime) or up_to_date(final_path, source_mtime):
+                    unchanged_count += 1
+                    continue
                 
                 try:
+                    # 古いリネーム後の出力は消しておく (リネームで上書きできないOSがあるため)
+                    if final_path != output_path and os.path.exists(final_path):
+                        os.remove(final_path)
+                    
                     # 1. 画像のロード
-                    img = Image.open(input_path)
+                    with pm.stage("decode"):
+                        img = Image.open(input_path)
+                        img.load()
                     
                     # 2. RGB形式に変換 (JPEGはアルファチャンネル非対応のため)
-                    if img.mode != 'RGB':
-                        img = img.convert('RGB')
+                    with pm.stage("preprocess"):
+                        if img.mode != 'RGB':
+                            img = img.convert('RGB')
                     
                     # 3. JPEG形式で保存
-                    img.save(output_path, 'JPEG', quality=JPEG_QUALITY)
+                    with pm.stage("io"):
+                        img.save(output_path, 'JPEG', quality=JPEG_QUALITY)
                     
                     # print(f"  ✅ 変換成功: {filename} -> {name}.jpg") # ファイル数が多い場合はコメントアウト推奨
                     converted_count += 1
@@ -109,14 +153,32 @@ def convert_categorized_images_to_jpg():
                 # サポートされていない形式のファイルはスキップ
                 skipped_count += 1
 
-        print(f"  結果: {converted_count} 個のファイルをJPEGに変換しました。スキップ: {skipped_count} 個。")
+        # 元の画像がなくなった出力を消す
+        removed_count = 0
+        for filename in os.listdir(target_dir):
+            path = os.path.join(target_dir, filename)
+            if (filename not in wanted and os.path.isfile(path)
+                    and os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS):
+                with pm.stage("io"):
+                    os.remove(path)
+                removed_count += 1
+
+        print(f"  結果: {converted_count} 個のファイルをJPEGに変換しました。"
+              f"変化なし: {unchanged_count} 個。削除: {removed_count} 個。スキップ: {skipped_count} 個。")
         total_converted_count += converted_count
         total_skipped_count += skipped_count
+        total_unchanged_count += unchanged_count
+        total_removed_count += removed_count
+        pm.count("converted", converted_count)
+        pm.count("skipped", skipped_count)
+        pm.count("unchanged", unchanged_count)
+        pm.count("removed", removed_count)
 
     print("-" * 40)
     print(f"🎉 全てのクラスの処理が完了しました。")
-    print(f"総変換ファイル数: {total_converted_count} 個。")
+    print(f"総変換ファイル数: {total_converted_count} 個。変化なし: {total_unchanged_count} 個。削除: {total_removed_count} 個。")
     print(f"新しいデータセットは '{TARGET_ROOT}' に保存されました。")
+    pm.dump("0_data2jpeg" if classes == CLASSES else "0_data2jpeg_" + "_".join(classes))
 
 if __name__ == "__main__":
-    convert_categorized_images_to_jpg()
\ No newline at end of file
+    convert_categorized_images_to_jpg(sys.argv[1:] or CLASSES)
\ No newline at end of file
@@ -14,19 +14,23 @@ dataset_j/
 """
 import os
 import re # 正規表現モジュールを使用
+import sys
+import config
+import perf_metrics as pm
 
 # --- 設定 ---
-ROOT_DIR = "dataset_j" 
+ROOT_DIR = config.JPEG_DIR
 
-# 処理対象とするクラスフォルダ名
-CLASSES = ['bike', 'cars', 'cats', 'dogs', 'flowers', 'horses', 'human']
+# 処理対象とするクラスフォルダ名 (config.py で設定)
+# python 1_dataset_name_cut.py bike のようにクラスを指定するとそのクラスだけ処理します
+CLASSES = config.CLASSES
 
 # 画像として処理する拡張子
 IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
 
 # --- メイン処理 ---
 
-def rename_files_to_numbers_only():
+def rename_files_to_numbers_only(classes=CLASSES):
     """
     クラスフォルダ内のファイルを走査し、ファイル名の先頭にある英字プレフィックスを
     取り除いて数字のみの名前にリネームします。
@@ -36,7 +40,7 @@ def rename_files_to_numbers_only():
     
     total_renamed_count = 0
     
-    for class_name in CLASSES:
+    for class_name in classes:
         target_dir = os.path.join(ROOT_DIR, class_name)
         
         if not os.path.exists(target_dir):
@@ -78,7 +82,8 @@ def rename_files_to_numbers_only():
 
                 try:
                     # ファイル名を変更
-                    os.rename(src_path, dst_path)
+                    with pm.stage("io"):
+                        os.rename(src_path, dst_path)
                     renamed_count += 1
                     # print(f"  リネーム: {filename} -> {new_filename}") 
                 except Exception as e:
@@ -86,9 +91,11 @@ def rename_files_to_numbers_only():
             
         print(f"  結果: {renamed_count} 個のファイルをリネームしました。")
         total_renamed_count += renamed_count
+        pm.count("renamed", renamed_count)
         
     print("-" * 40)
     print(f"🎉 全ての処理が完了しました。総リネーム数: {total_renamed_count} 個。")
+    pm.dump("1_dataset_name_cut" if classes == CLASSES else "1_dataset_name_cut_" + "_".join(classes))
 
 if __name__ == "__main__":
-    rename_files_to_numbers_only()
\ No newline at end of file
+    rename_files_to_numbers_only(sys.argv[1:] or CLASSES)
\ No newline at end of file
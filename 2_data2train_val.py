@@ -23,18 +23,24 @@ dataset_tv/
 
 に分ける
 
+分けた結果は目録 (catalog.sqlite3) にも記録します。
+2回目以降は目録にある画像の train/val をそのまま使い、
+コピー済みで変化のない画像はコピーし直しません。
 """
 import os
 import shutil
 import random
+import catalog
+import config
+import perf_metrics as pm
 
 # --- 設定 ---
-SOURCE_ROOT = "dataset_j"   # 元のクラス別データセットのルート
-TARGET_ROOT = "dataset_tv"  # 新しいYOLO形式のデータセットのルート
+SOURCE_ROOT = config.JPEG_DIR  # 元のクラス別データセットのルート
+TARGET_ROOT = config.TV_DIR    # 新しいYOLO形式のデータセットのルート
 VAL_RATIO = 0.20            # 検証データに割り当てる割合 (20%に設定)
 
-# 処理対象とするクラスフォルダ名
-CLASSES = ['bike', 'cars', 'cats', 'dogs', 'flowers', 'horses', 'human']
+# 処理対象とするクラスフォルダ名 (config.py で設定)
+CLASSES = config.CLASSES
 
 # --- メイン処理 ---
 
@@ -53,6 +59,7 @@ def prepare_yolo_dataset():
     print("-" * 50)
     
     total_images_processed = 0
+    conn = catalog.connect()
     
     for class_name in CLASSES:
         source_dir = os.path.join(SOURCE_ROOT, class_name)
@@ -68,21 +75,28 @@ def prepare_yolo_dataset():
             print(f"  クラス '{class_name}': ファイルが見つかりません。スキップ。")
             continue
 
-        # 2. ファイルリストをランダムにシャッフル
-        random.shuffle(all_files)
-        
-        # 3. 分割点を計算
-        num_val = int(len(all_files) * VAL_RATIO)
+        prefix = class_name.lower() + "_"
+
+        # 2. 目録にある画像は前回と同じ split を使う
+        known = {r['name']: r for r in conn.execute(
+            "SELECT name, split, size, mtime_ns FROM images WHERE class = ?", (class_name,))}
+        old_files = [f for f in all_files if prefix + f in known]
+        new_files = [f for f in all_files if prefix + f not in known]
+
+        # 3. 新しい画像だけをランダムにシャッフルし、全体が VAL_RATIO になるように分割点を計算
+        random.shuffle(new_files)
+        num_val_old = sum(1 for f in old_files if known[prefix + f]['split'] == 'val')
+        num_val = min(max(int(len(all_files) * VAL_RATIO) - num_val_old, 0), len(new_files))
         
         # 4. ファイルを train と val に分割
-        val_files = all_files[:num_val]
-        train_files = all_files[num_val:]
+        val_files = new_files[:num_val] + [f for f in old_files if known[prefix + f]['split'] == 'val']
+        train_files = new_files[num_val:] + [f for f in old_files if known[prefix + f]['split'] == 'train']
         
         # 5. ファイルを新しい構造にコピー (クラス名プレフィックスを付与)
         
         def copy_and_rename_files(file_list, split_name):
             target_image_path = os.path.join(TARGET_ROOT, 'images', split_name)
-            prefix = class_name.lower() + "_"
+            copied = 0
             
             for filename in file_list:
                 src_file = os.path.join(source_dir, filename)
@@ -91,22 +105,49 @@ def prepare_yolo_dataset():
                 # 例: bike/123.jpg -> bike_123.jpg
                 dst_filename = prefix + filename
                 dst_file = os.path.join(target_image_path, dst_filename) 
+
+                # コピー済みで変化がなければスキップ
+                row = known.get(dst_filename)
+                if row is not None and os.path.exists(dst_file):
+                    st = os.stat(src_file)
+                    if (row['size'], row['mtime_ns']) == (st.st_size, st.st_mtime_ns):
+                        continue
                 
                 try:
-                    shutil.copy2(src_file, dst_file)
+                    with pm.stage("io"):
+                        shutil.copy2(src_file, dst_file)
+                        digest = catalog.file_hash(dst_file)
+                    catalog.upsert_image(conn, dst_filename, class_name, split_name, dst_file, digest)
+                    copied += 1
                 except Exception as e:
                     print(f"❌ コピー失敗: {filename} -> {split_name}。原因: {e}")
+            return copied
+
 
+        with conn:
+            copied = copy_and_rename_files(train_files, 'train')
+            copied += copy_and_rename_files(val_files, 'val')
 
-        copy_and_rename_files(train_files, 'train')
-        copy_and_rename_files(val_files, 'val')
+            # 元フォルダから消えた画像は目録と dataset_tv からも消す
+            current = {prefix + f for f in all_files}
+            for name, row in known.items():
+                if name not in current:
+                    stale = os.path.join(TARGET_ROOT, 'images', row['split'], name)
+                    if os.path.exists(stale):
+                        os.remove(stale)
+                    catalog.remove_image(conn, name)
         
-        print(f"  クラス '{class_name}' 処理完了: Train={len(train_files)}枚, Val={len(val_files)}枚")
+        print(f"  クラス '{class_name}' 処理完了: Train={len(train_files)}枚, Val={len(val_files)}枚 (コピー {copied}枚)")
         total_images_processed += len(all_files)
+        pm.count("train", len(train_files))
+        pm.count("val", len(val_files))
+        pm.count("copied", copied)
 
     print("-" * 50)
     print(f"🎉 データセットの分割とリネームが完了しました。総画像数: {total_images_processed}枚")
     print(f"新しい画像は '{TARGET_ROOT}/images/' フォルダに保存されました。")
+    conn.close()
+    pm.dump("2_data2train_val")
     print("\n次のステップ: この新しい画像名に対応する **YOLO形式のラベル (.txt) ファイル**を作成する必要があります。")
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+license
+GNU Affero General Public License v3（AGPL v3）
+
+分類モデル用のデータセットを作ります。
+
+画像1枚に1つの物体が写っている(3_labels.py は中央に1つの枠を付けるだけ)ので、
+検出モデルの代わりに分類モデル (yolov8n-cls.pt) でも判定できます。
+分類モデルは枠の出力・NMSがないぶん、推論が軽くなります。
+
+dataset_tv の画像を、クラス名のフォルダに分けて dataset_c に置きます。
+
+dataset_c/
+├── train/
+│   ├── bike/ bike_00001.jpg ...
+│   └── ...
+└── val/
+    └── ...
+
+画像はハードリンクで置くのでディスクは増えません (できない時はコピー)。
+対象画像とクラスは目録 (catalog.sqlite3) から読み、前回から変化のない画像は処理しません。
+
+python 3_cls_dataset.py
+python 4_train_cls.py
+"""
+import os
+import shutil
+import catalog
+import config
+import perf_metrics as pm
+
+# --- 設定 ---
+SOURCE_DIR = config.TV_DIR    # 2_data2train_val.py の出力
+TARGET_DIR = config.CLS_DIR
+SPLITS = config.SPLITS
+
+
+def place(src, dst):
+    """src を dst にハードリンクする (別のドライブなどでできなければコピー)"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def build_split(conn, split):
+    source_dir = os.path.join(SOURCE_DIR, 'images', split)
+    catalog.ensure_split(conn, split, source_dir)
+
+    # クラスのフォルダは画像がなくても作る (フォルダの数がクラス数になるため)
+    for cls in config.CLASSES:
+        os.makedirs(os.path.join(TARGET_DIR, split, cls), exist_ok=True)
+
+    placed = skipped = 0
+    wanted = set()
+    for row in catalog.list_split(conn, split):
+        if row['class'] not in config.CLASSES:
+            print(f"⚠️ 警告: {row['name']} のクラス '{row['class']}' は config.CLASSES にありません。スキップします。")
+            continue
+        dst = os.path.join(TARGET_DIR, split, row['class'], row['name'])
+        wanted.add(dst)
+        try:
+            if os.path.exists(dst):
+                if os.path.samefile(row['path'], dst) or os.path.getsize(dst) == row['size']:
+                    skipped += 1
+                    continue
+                os.remove(dst)
+            with pm.stage("io"):
+                place(row['path'], dst)
+            placed += 1
+        except OSError as e:
+            print(f"❌ エラー: {row['path']} -> {e}")
+
+    # 目録から消えた画像 (2_data2train_val.py で移動したものなど) を取り除く
+    removed = 0
+    for cls in config.CLASSES:
+        class_dir = os.path.join(TARGET_DIR, split, cls)
+        for entry in os.scandir(class_dir):
+            if entry.is_file() and entry.path not in wanted:
+                os.remove(entry.path)
+                removed += 1
+
+    print(f"{split:5s}: 配置={placed}  変化なし={skipped}  削除={removed}")
+    pm.count(f"{split}_placed", placed)
+    pm.count(f"{split}_skipped", skipped)
+
+
+if __name__ == "__main__":
+    if not os.path.isdir(SOURCE_DIR):
+        print(f"❌ エラー: ソースディレクトリ '{SOURCE_DIR}' が見つかりません。")
+    else:
+        conn = catalog.connect()
+        for split in SPLITS:
+            build_split(conn, split)
+        conn.close()
+        print(f"\n🎉 分類用データセットを '{TARGET_DIR}' に作成しました。")
+    pm.dump("3_cls_dataset")
@@ -8,32 +8,32 @@
 python -m pip install pillow
 
 dataset_tvを対象にラベルをつくり　同じディレクトリにlabelsフォルダを作ります
+
+対象画像とクラスは目録 (catalog.sqlite3) から読み、画像サイズとラベルも目録に記録します。
+前回ラベルを作った画像で変化のないものは処理しません。
+目録にない画像 (元データから消したもの) は dataset_l の画像・ラベルからも削除します。
 """
 import os
 from PIL import Image
 import shutil
+import catalog
+import config
+import perf_metrics as pm
 
 # --- 設定 ---
-SOURCE_DIR = "dataset_tv"  # 既存の画像データセットのルートディレクトリ名
-TARGET_DIR = "dataset_l" # 新しいYOLO形式のデータセットのルートディレクトリ名
+SOURCE_DIR = config.TV_DIR     # 既存の画像データセットのルートディレクトリ名
+TARGET_DIR = config.LABEL_DIR  # 新しいYOLO形式のデータセットのルートディレクトリ名
 
 # クラス定義 (ファイル名のプレフィックスに基づきクラスIDを決定)
-CLASSES = {
-    "bike": 0,
-    "cars": 1,
-    "cats": 2,
-    "dogs": 3,
-    "flowers": 4,
-    "horses": 5,
-    "human": 6
-}
+# 例: {"bike": 0, "cars": 1, ...}  config.py の CLASSES の順番がクラスIDになります
+CLASSES = config.class_ids()
 
 # バウンディングボックスの縮小率 (0.8 = 画像の幅・高さの80%を使用)
 # 画像全体がオブジェクトであると仮定し、上下左右それぞれ5%ずつ内側に縮小する
 SCALE_FACTOR = 0.8
 
 # --- ディレクトリ構造の定義 ---
-SPLITS = ['train', 'val']
+SPLITS = config.SPLITS
 
 def create_target_structure():
     """新しいYOLOv8形式のディレクトリ構造を作成する"""
@@ -48,6 +48,7 @@ def create_target_structure():
 
 def create_yolo_labels_and_copy_images():
     """画像をコピーし、ラベルファイルを生成する"""
+    conn = catalog.connect()
     for split in SPLITS:
         source_image_dir = os.path.join(SOURCE_DIR, 'images', split)
         
@@ -62,32 +63,43 @@ def create_yolo_labels_and_copy_images():
         
         processed_count = 0
         deleted_count = 0
+        skipped_count = 0
 
-        for filename in os.listdir(source_image_dir):
-            if not filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-                continue
+        # 目録がなければ一度だけフォルダを走査して作る
+        catalog.ensure_split(conn, split, source_image_dir)
+        labeled = {r[0] for r in conn.execute(
+            "SELECT DISTINCT image_id FROM labels JOIN images ON images.id = labels.image_id"
+            " WHERE images.split = ?", (split,))}
 
-            source_image_path = os.path.join(source_image_dir, filename)
+        for row in catalog.list_split(conn, split):
+            filename = row['name']
+            source_image_path = row['path']
             target_image_path = os.path.join(target_image_dir, filename)
             
             label_filename = filename.rsplit('.', 1)[0] + '.txt'
             target_label_path = os.path.join(target_label_dir, label_filename)
 
-            # 1. クラスIDの決定
-            class_name_prefix = filename.split('_')[0].lower()
-            if class_name_prefix not in CLASSES:
-                print(f"⚠️ 警告: {filename} のプレフィックスにクラスIDが未定義です。スキップします。")
+            # 前回処理済みで変化がなければスキップ
+            if row['id'] in labeled and os.path.exists(target_image_path) and os.path.exists(target_label_path):
+                skipped_count += 1
                 continue
 
-            class_id = CLASSES[class_name_prefix]
+            # 1. クラスIDの決定 (目録に記録されたクラス)
+            if row['class'] not in CLASSES:
+                print(f"⚠️ 警告: {filename} のクラス '{row['class']}' にクラスIDが未定義です。スキップします。")
+                continue
+
+            class_id = CLASSES[row['class']]
 
             # 2. 画像の読み込みとエラー処理 (読み込めないファイルを検出)
             try:
-                img = Image.open(source_image_path)
-                width, height = img.size
+                with pm.stage("decode"):
+                    img = Image.open(source_image_path)
+                    width, height = img.size
                 
                 # 3. 読み込み成功した場合、新しいディレクトリに画像をコピー
-                shutil.copy2(source_image_path, target_image_path)
+                with pm.stage("io"):
+                    shutil.copy2(source_image_path, target_image_path)
                 
             except Exception as e:
                 # Pillowが画像を認識できない、または破損している場合
@@ -99,6 +111,7 @@ def create_yolo_labels_and_copy_images():
                     deleted_count += 1
                 except:
                     print(f"❌ 元ファイルの削除に失敗しました: {source_image_path}")
+                catalog.remove_image(conn, filename)
                 continue
 
             # 4. YOLO形式座標の計算 (縮小したバウンディングボックス)
@@ -111,13 +124,42 @@ def create_yolo_labels_and_copy_images():
             h_norm = SCALE_FACTOR
 
             # 5. ラベルファイルの書き出し
-            with open(target_label_path, 'w') as f:
+            with pm.stage("io"), open(target_label_path, 'w') as f:
                 # YOLO形式: [class_id] [x_center] [y_center] [width] [height]
                 f.write(f"{class_id} {x_center_norm:.6f} {y_center_norm:.6f} {w_norm:.6f} {h_norm:.6f}\n")
 
+            # 6. 目録に画像サイズとラベルを記録 (まとめてコミット)
+            catalog.set_size(conn, row['id'], width, height)
+            catalog.set_labels(conn, row['id'], [(class_id, x_center_norm, y_center_norm, w_norm, h_norm)])
+
             processed_count += 1
 
-        print(f"  ✅ {split.upper()}処理完了: {processed_count} 個の画像とラベルを生成。{deleted_count} 個の破損ファイルを削除しました。")
+        conn.commit()
+        removed_count = prune_split(conn, split, target_image_dir, target_label_dir)
+
+        pm.count(f"{split}_labels", processed_count)
+        pm.count(f"{split}_removed", removed_count)
+        pm.count("deleted", deleted_count)
+        pm.count(f"{split}_skipped", skipped_count)
+        print(f"  ✅ {split.upper()}処理完了: {processed_count} 個の画像とラベルを生成。{deleted_count} 個の破損ファイルを削除しました。"
+              f" (変化なし {skipped_count} 個、目録にないため削除 {removed_count} 個)")
+    conn.close()
+
+
+def prune_split(conn, split, image_dir, label_dir):
+    """目録の split にない画像とラベルを削除し、削除した画像の数を返す"""
+    names = {row['name'] for row in catalog.list_split(conn, split)}
+    stems = {name.rsplit('.', 1)[0] for name in names}
+    removed = 0
+    with pm.stage("io"):
+        for entry in os.scandir(image_dir):
+            if entry.is_file() and entry.name not in names:
+                os.remove(entry.path)
+                removed += 1
+        for entry in os.scandir(label_dir):
+            if entry.is_file() and entry.name.endswith('.txt') and entry.name[:-4] not in stems:
+                os.remove(entry.path)
+    return removed
 
 
 # --- メイン処理 ---
@@ -125,4 +167,5 @@ if __name__ == "__main__":
     create_target_structure()
     create_yolo_labels_and_copy_images()
     print("\n🎉 データセットの変換が完了しました。")
-    print(f"新しいYOLO形式のデータセットは '{TARGET_DIR}' に作成されました。")
\ No newline at end of file
+    print(f"新しいYOLO形式のデータセットは '{TARGET_DIR}' に作成されました。")
+    pm.dump("3_labels")
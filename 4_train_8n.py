@@ -7,8 +7,79 @@ yolo detect train data=data.yaml model=yolov8n.pt epochs=2 imgsz=128
 として処理した結果を使う
 
 対象画像はdata.yamlで指定
+モデル・エポック数・画像サイズは config.py で設定
+
+python 4_train_8n.py data_subset.yaml
+のように data.yaml を指定すると、そのファイルで学習します (subset_sampler.py で作ったものなど)
+
+学習ループ (エポックごとの検証・保存を除いた時間) から 1秒あたりの学習画像数を、
+それ以外の時間 (検証・保存など、学習画像の枚数では変わらない分) を1エポックあたりの秒数として
+runs/throughput.json に記録します。
+subset_sampler.py はこの値を使って学習時間の目標から画像数を決めます。
 """
+import json
+import os
+import sys
+import time
 from ultralytics import YOLO
+import config
+import perf_metrics as pm
+
+data = sys.argv[1] if len(sys.argv) > 1 else config.TRAIN_DATA
+
+model = YOLO(config.TRAIN_MODEL)
+
+# 学習ループの時間だけを測る (on_train_epoch_end は検証の前に呼ばれる)
+train_loop = {"start": None, "seconds": 0.0}
+
+
+def on_train_epoch_start(trainer):
+    train_loop["start"] = time.perf_counter()
+
+
+def on_train_epoch_end(trainer):
+    if train_loop["start"] is not None:
+        train_loop["seconds"] += time.perf_counter() - train_loop["start"]
+        train_loop["start"] = None
+
+
+model.add_callback("on_train_epoch_start", on_train_epoch_start)
+model.add_callback("on_train_epoch_end", on_train_epoch_end)
+t0 = time.perf_counter()
+with pm.stage("train"):
+    # 学習結果は毎回 runs/detect/train に上書き保存 (config.MODEL_PATH と一致させる)
+    # project は絶対パスで渡す (相対パスだと ultralytics の設定の runs_dir の下に作られるため)
+    results = model.train(data=data, epochs=config.TRAIN_EPOCHS, imgsz=config.TRAIN_IMGSZ,
+                          project=os.path.abspath(config.TRAIN_PROJECT), name=config.TRAIN_NAME, exist_ok=True)
+elapsed = time.perf_counter() - t0
+train_s = train_loop["seconds"]
+
+# 学習速度の記録 (画像サイズごと)
+try:
+    n_images = len(model.trainer.train_loader.dataset)
+except AttributeError:
+    n_images = 0
+if n_images and train_s > 0:
+    throughput = {}
+    if os.path.exists(config.THROUGHPUT_FILE):
+        with open(config.THROUGHPUT_FILE, encoding="utf-8") as f:
+            throughput = json.load(f)
+    throughput[str(config.TRAIN_IMGSZ)] = {
+        "images_per_sec": n_images * config.TRAIN_EPOCHS / train_s,
+        "overhead_s_per_epoch": max(elapsed - train_s, 0.0) / config.TRAIN_EPOCHS,
+        "images": n_images,
+        "epochs": config.TRAIN_EPOCHS,
+        "train_s": train_s,
+        "elapsed_s": elapsed,
+        "model": config.TRAIN_MODEL,
+        "data": data,
+        "measured": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    os.makedirs(os.path.dirname(config.THROUGHPUT_FILE), exist_ok=True)
+    with open(config.THROUGHPUT_FILE, "w", encoding="utf-8") as f:
+        json.dump(throughput, f, ensure_ascii=False, indent=2)
+    print(f"学習速度: {n_images * config.TRAIN_EPOCHS / train_s:.1f} 枚/秒 "
+          f"(学習ループ {train_s:.1f}秒 / 全体 {elapsed:.1f}秒, {config.THROUGHPUT_FILE} に記録)")
+pm.count("train_images", n_images)
+pm.dump("4_train_8n")
 
-model = YOLO("yolov8n.pt")
-results = model.train(data="data.yaml", epochs=2, imgsz=128)
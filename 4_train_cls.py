@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+license
+GNU Affero General Public License v3（AGPL v3）
+
+yolo classify train data=dataset_c model=yolov8n-cls.pt epochs=2 imgsz=128
+として処理した結果を使う (分類モード)
+
+対象画像は 3_cls_dataset.py で作った dataset_c (train/val/<クラス名>/)
+モデル・エポック数・画像サイズは config.py の CLS_MODEL, TRAIN_EPOCHS, CLS_IMGSZ で設定
+
+学習結果は runs/classify/train/weights/best.pt (config.CLS_MODEL_PATH)
+config.TASK = "classify" にすると 7_all_inference.py がこのモデルで判定します。
+"""
+import os
+import sys
+from ultralytics import YOLO
+import config
+import perf_metrics as pm
+
+data = sys.argv[1] if len(sys.argv) > 1 else config.CLS_DIR
+
+model = YOLO(config.CLS_MODEL)
+with pm.stage("train"):
+    # project は絶対パスで渡す (相対パスだと ultralytics の設定の runs_dir の下に作られるため)
+    results = model.train(data=os.path.abspath(data), epochs=config.TRAIN_EPOCHS, imgsz=config.CLS_IMGSZ,
+                          project=os.path.abspath(config.CLS_PROJECT), name=config.TRAIN_NAME, exist_ok=True)
+try:
+    pm.count("train_images", len(model.trainer.train_loader.dataset))
+except AttributeError:
+    pass
+pm.dump("4_train_cls")
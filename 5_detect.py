@@ -9,13 +9,15 @@ import os
 from ultralytics import YOLO
 import matplotlib.pyplot as plt
 from glob import glob
+import config
+import perf_metrics as pm
 
 # --- 設定 ---
 
 # 1. 学習済みモデルのパス
 # YOLOv8の学習結果は通常、'runs/detect/train' または 'runs/detect/trainX' に保存されます。
 # ここでは、学習が完了した際の最も性能が良い重みファイル (best.pt) を指定します。
-MODEL_PATH = 'runs/detect/train/weights/best.pt'
+MODEL_PATH = config.MODEL_PATH
 # MODEL_PATH = '/Volumes/Lexar/yolo/runs/detect/train/weights/last.pt'
 
 # 2. 検出対象の画像またはフォルダのパス
@@ -44,13 +46,16 @@ def run_inference():
     print(f"推論を {SOURCE_PATH} に対して実行中...")
     
     # predictメソッドを使用して推論を実行
-    results = model.predict(
-        source=SOURCE_PATH,  # 推論対象
-        conf=0.25,           # 信頼度閾値 (デフォルト: 0.25)
-        iou=0.7,             # IOU閾値 (重複バウンディングボックスの除去用)
-        save=True,           # 検出結果の画像保存を有効化
-        project=PROJECT_NAME # 結果を保存するルートディレクトリ名
-    )
+    with pm.stage("predict"):
+        results = model.predict(
+            source=SOURCE_PATH,  # 推論対象
+            conf=0.25,           # 信頼度閾値 (デフォルト: 0.25)
+            iou=0.7,             # IOU閾値 (重複バウンディングボックスの除去用)
+            save=True,           # 検出結果の画像保存を有効化
+            project=PROJECT_NAME # 結果を保存するルートディレクトリ名
+        )
+    pm.observe_speed(results)
+    pm.count("images", len(results))
     # 結果の取得
     for result in results:
         boxes = result.boxes  # バウンディングボックス情報
@@ -75,6 +80,8 @@ def run_inference():
     print("推論が完了しました。")
     print(f"結果の画像は '{PROJECT_NAME}/predict' のようなフォルダに保存されています。")
 
+    pm.dump("5_detect")
+
     jpg_files = glob(os.path.join(results[0].save_dir, "*.jpg"))
     # Matplotlibで結果画像を表示
     img = plt.imread(jpg_files[0])
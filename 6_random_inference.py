@@ -8,11 +8,13 @@ license
 GNU Affero General Public License v3（AGPL v3）
 """
 import os
-import random
 import matplotlib.pyplot as plt
 from glob import glob
 from ultralytics import YOLO
 import shutil
+import catalog
+import config
+import perf_metrics as pm
 
 # # 学習済みモデルの読み込み
 # model = load_model('cats_vs_dogs_cnn.h5')
@@ -20,20 +22,17 @@ import shutil
 # 1. 学習済みモデルのパス
 # YOLOv8の学習結果は通常、'runs/detect/train' または 'runs/detect/trainX' に保存されます。
 # ここでは、学習が完了した際の最も性能が良い重みファイル (best.pt) を指定します。
-MODEL_PATH = 'runs/detect/train/weights/best.pt'
+MODEL_PATH = config.MODEL_PATH
 
 # 推論対象フォルダ（猫・犬の両方を含む上位フォルダ）
-base_dir = 'dataset_tv/images/val'
+base_dir = os.path.join(config.TV_DIR, 'images', 'val')
 
 
-img_list = []
+# 画像は目録 (catalog.sqlite3) から選ぶ (フォルダは走査しない)
+conn = catalog.connect()
+catalog.ensure_split(conn, 'val', base_dir)
 
-folder_path = os.path.join(base_dir)
-files = [os.path.join(folder_path, f) for f in os.listdir(folder_path)
-            if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-img_list.extend(files)
-
-if not img_list:
+if catalog.count(conn, 'val') == 0:
     print("画像ファイルが見つかりません。フォルダのパスを確認してください。")
     exit()
 
@@ -61,16 +60,19 @@ PROJECT_NAME = 'custom_inference'
 def show_random_image(event=None):
     """ランダムに画像を選んで推論＆表示"""
     global img_show
-    img_path = random.choice(img_list)
+    img_path = catalog.sample(conn, 'val', 1)[0]['path']
 
     # predictメソッドを使用して推論を実行
-    results = model.predict(
-        source=img_path,  # 推論対象
-        conf=0.25,           # 信頼度閾値 (デフォルト: 0.25)
-        iou=0.7,             # IOU閾値 (重複バウンディングボックスの除去用)
-        save=True,           # 検出結果の画像保存を有効化
-        project=PROJECT_NAME # 結果を保存するルートディレクトリ名
-    )
+    with pm.stage("predict"):
+        results = model.predict(
+            source=img_path,  # 推論対象
+            conf=0.25,           # 信頼度閾値 (デフォルト: 0.25)
+            iou=0.7,             # IOU閾値 (重複バウンディングボックスの除去用)
+            save=True,           # 検出結果の画像保存を有効化
+            project=PROJECT_NAME # 結果を保存するルートディレクトリ名
+        )
+    pm.observe_speed(results)
+    pm.count("images")
     # 結果の取得
     for result in results:
         boxes = result.boxes  # バウンディングボックス情報
@@ -93,11 +95,12 @@ def show_random_image(event=None):
     jpg_files = glob(os.path.join(results[0].save_dir, "*.jpg"))
 
     # Matplotlibで結果画像を表示
-    img = plt.imread(jpg_files[0])
-    plt.imshow(img)
-    plt.axis("off")
-    plt.title("YOLO 7 Category")
-    plt.show()
+    with pm.stage("render"):
+        img = plt.imread(jpg_files[0])
+        plt.imshow(img)
+        plt.axis("off")
+        plt.title("YOLO 7 Category")
+        plt.show()
     plt.pause(0.1)  # 少し待つ
 
 def on_key(event):
@@ -113,6 +116,9 @@ def on_key(event):
         plt.close(fig)
         plt.ioff()  # 終了時にオフ
 
+# 環境変数 YOLO7_METRICS_PORT があればPrometheus用エンドポイントを起動
+pm.serve_from_env()
+
 # キーイベントを接続
 fig.canvas.mpl_connect('key_press_event', on_key)
 
@@ -120,3 +126,4 @@ fig.canvas.mpl_connect('key_press_event', on_key)
 show_random_image()
 
 plt.show()
+pm.dump("6_random_inference")
@@ -5,33 +5,51 @@ GNU Affero General Public License v3（AGPL v3）
 
 YOLO多クラス分類 推論サンプル（全画像順次処理）
 - Ultralytics YOLOv8 学習済みモデルを使用
+  (config.TASK = "classify" なら分類モデル runs/classify/train/weights/best.pt)
+- python 7_all_inference.py <モデルのパス> で別のモデルも評価できます
+- imgsz_sweep.py で選んだ設定 (runs/sweep/chosen_<detect|classify>.json) があれば
+  そのモデル・画像サイズ・スレッド数で推論
 - valフォルダ内に全クラスの画像が混在
-- ファイル名の先頭にクラス名が含まれている形式に対応
+- 正解クラスは目録 (catalog.sqlite3) から取得
+  (目録がなければファイル名の先頭のクラス名から一度だけ作成)
+- 画像はまとめて(バッチで)推論し、画像ごとの判定結果と信頼度を目録に記録
+  (hard_mining.py が次の学習データを選ぶのに使います)
+- 誤判定画像はサムネイルのHTMLレポート (result_err/index.html) にまとめる
 """
 
 import os
-import shutil
+import sys
 from ultralytics import YOLO
+import catalog
+import config
+import error_report
+import perf_metrics as pm
+import yolo_eval
 
 # ==============================
 # 設定
 # ==============================
-MODEL_PATH = 'runs/detect/train/weights/best.pt'
-VAL_DIR = 'dataset_tv/images/val'
-CLASSES = ['bike', 'cars', 'cats', 'dogs', 'flowers', 'horses', 'human']
+if len(sys.argv) > 1:
+    SETTINGS = {'model': sys.argv[1], 'imgsz': None, 'threads': None, 'model_id': None}
+else:
+    SETTINGS = yolo_eval.inference_settings()
+MODEL_PATH = SETTINGS['model']
+VAL_DIR = os.path.join(config.TV_DIR, 'images', 'val')
+CLASSES = config.CLASSES
 ERR_DIR = 'result_err'
-ERR_SAVE = True  # 誤判定画像を保存するか
+ERR_SAVE = True  # 誤判定画像のレポートを作るか
 
 # ==============================
 # 前処理
 # ==============================
-# result_errを削除して新規作成
-if os.path.exists(ERR_DIR):
-    shutil.rmtree(ERR_DIR)
-os.makedirs(ERR_DIR, exist_ok=True)
+# 誤判定レポート (サムネイルは result_err/thumbs に残して次回も使う)
+report = error_report.ErrorReport(ERR_DIR) if ERR_SAVE else None
 
-# YOLOモデルの読み込み
-model = YOLO(MODEL_PATH)
+# YOLOモデルの読み込み (検出・分類のどちらでもよい)
+yolo_eval.set_threads(SETTINGS['threads'])
+model = YOLO(MODEL_PATH, task=None if MODEL_PATH.endswith('.pt') else config.TASK)
+predict_args = {'imgsz': SETTINGS['imgsz']} if SETTINGS['imgsz'] else {}
+print(f"yoloモデル: {MODEL_PATH} ({model.task})")
 
 # 結果格納用
 stats = {cls: {"total": 0, "correct": 0, "wrong": 0} for cls in CLASSES}
@@ -41,57 +59,44 @@ stats = {cls: {"total": 0, "correct": 0, "wrong": 0} for cls in CLASSES}
 # ==============================
 print("推論を開始します...\n")
 
-for fname in os.listdir(VAL_DIR):
-    if not fname.lower().endswith(('.jpg', '.jpeg', '.png')):
-        continue
-    if "._" in fname:
-        continue
-
-    img_path = os.path.join(VAL_DIR, fname)
-
-    # ファイル名から正解クラスを特定
-    fname_lower = fname.lower()
-    true_cls = None
-    for cls in CLASSES:
-        if fname_lower.startswith(cls.lower()):
-            true_cls = cls
-            break
+conn = catalog.connect()
+catalog.ensure_split(conn, 'val', VAL_DIR)
+# エクスポートしたモデルでも、元の学習済みモデル(.pt)のIDと画像サイズで記録する (hard_mining.py と合わせる)
+model_id = yolo_eval.record_id(SETTINGS)
 
-    if true_cls is None:
-        print(f"⚠️ クラス名を判定できません: {fname}")
+rows = {}
+for row in catalog.list_split(conn, 'val'):
+    # 目録から正解クラスを取得
+    if row['class'] not in stats:
+        print(f"⚠️ クラス名を判定できません: {row['name']}")
         continue
+    rows[row['path']] = row
 
+# 推論実行 (バッチでまとめて推論し、最も信頼度が高い予測を使用)
+for img_path, pred_cls_name, conf, margin in yolo_eval.predict_top1(model, rows, **predict_args):
+    row = rows[img_path]
+    true_cls = row['class']
     stats[true_cls]["total"] += 1
+    if pred_cls_name is None:
+        continue
 
-    try:
-        # 推論実行
-        results = model.predict(img_path, verbose=False)
-        boxes = results[0].boxes
-
-        if len(boxes) > 0:
-            # 最も信頼度が高い予測を使用
-            confs = boxes.conf.cpu().numpy()
-            cls_ids = boxes.cls.cpu().numpy().astype(int)
-            max_idx = confs.argmax()
-            pred_cls_name = model.names[cls_ids[max_idx]].lower()
-        else:
-            pred_cls_name = "none"
-
-        # 正解・誤判定チェック
-        if pred_cls_name == true_cls.lower():
-            stats[true_cls]["correct"] += 1
-        else:
-            stats[true_cls]["wrong"] += 1
-            if ERR_SAVE:
-                err_subdir = os.path.join(ERR_DIR, true_cls, pred_cls_name)
-                os.makedirs(err_subdir, exist_ok=True)
-                shutil.copy(img_path, err_subdir)
-
-    except Exception as e:
-        print(f"⚠️ エラー: {img_path} -> {e}")
-
+    # 正解・誤判定チェック
+    correct = pred_cls_name == true_cls.lower()
+    catalog.record_prediction(conn, row['id'], model_id, pred_cls_name, conf, margin, correct)
+    if correct:
+        stats[true_cls]["correct"] += 1
+    else:
+        stats[true_cls]["wrong"] += 1
+        if report is not None:
+            report.add(img_path, true_cls, pred_cls_name, conf, row['hash'])
+
+conn.commit()
+conn.close()
 print("\n推論完了\n")
 
+if report is not None:
+    print(f"誤判定レポート: {report.close()}")
+
 # ==============================
 # 結果表示
 # ==============================
@@ -111,3 +116,7 @@ if total_all > 0:
     print(f"\n総合正解率: {overall_acc:.1f}% ({correct_all}/{total_all})")
 else:
     print("画像が見つかりませんでした。")
+
+pm.count("images", total_all)
+pm.count("correct", correct_all)
+pm.dump("7_all_inference")
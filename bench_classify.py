@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+license
+GNU Affero General Public License v3（AGPL v3）
+
+検出モデルと分類モデルの比較
+
+同じ val の画像 (目録 catalog.sqlite3 の val) を、
+  ・検出モデル (4_train_8n.py の best.pt)   最も信頼度が高い検出のクラス
+  ・分類モデル (4_train_cls.py の best.pt)  1位のクラス
+で判定し (どちらも 7_all_inference.py と同じ yolo_eval.py の判定)、
+1秒あたりの画像数・前処理/推論/後処理の時間・正解率を比べます。
+結果は bench_results/classify_<日時>.json に保存します。
+
+使い方
+python bench_classify.py
+python bench_classify.py --detect runs/detect/train/weights/best.pt --classify runs/classify/train/weights/best.pt
+python bench_classify.py --limit 500 --batch 32
+"""
+import argparse
+import json
+import os
+import time
+
+from ultralytics import YOLO
+
+import catalog
+import config
+import yolo_eval
+
+RESULT_DIR = "bench_results"
+
+
+def evaluate(model_path, rows, batch_size):
+    """モデル1つで rows を判定し、速度と正解率を返す"""
+    model = YOLO(model_path)
+    result = yolo_eval.evaluate(model, rows, batch_size)
+    return {'model': model_path, 'task': model.task, 'imgsz': model.overrides.get('imgsz'), **result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="検出モデルと分類モデルの速度・正解率の比較")
+    parser.add_argument('--detect', default=config.MODEL_PATH, help="検出モデル")
+    parser.add_argument('--classify', default=config.CLS_MODEL_PATH, help="分類モデル")
+    parser.add_argument('--batch', type=int, default=yolo_eval.BATCH_SIZE)
+    parser.add_argument('--limit', type=int, default=None, help="使う画像数 (省略時は val すべて)")
+    parser.add_argument('--out', default=RESULT_DIR)
+    args = parser.parse_args()
+
+    conn = catalog.connect()
+    catalog.ensure_split(conn, 'val', os.path.join(config.TV_DIR, 'images', 'val'))
+    rows = {r['path']: r for r in catalog.list_split(conn, 'val')[:args.limit]}
+    conn.close()
+    if not rows:
+        print("❌ エラー: val の画像がありません。2_data2train_val.py を先に実行してください。")
+        return
+
+    results = {}
+    for name, path in (('detect', args.detect), ('classify', args.classify)):
+        if not os.path.exists(path):
+            print(f"⚠️ 警告: {name} のモデルがありません: {path}")
+            continue
+        results[name] = r = evaluate(path, rows, args.batch)
+        speed = "  ".join(f"{k}={v:.2f}ms" for k, v in r['speed_ms'].items())
+        print(f"{name:8s}: {r['images_per_sec']:7.1f} 枚/秒  正解率 {r['accuracy'] * 100:5.1f}%  "
+              f"imgsz={r['imgsz']}  {speed}")
+    if len(results) == 2 and results['detect']['images_per_sec'] > 0:
+        ratio = results['classify']['images_per_sec'] / results['detect']['images_per_sec']
+        print(f"分類モデルは検出モデルの {ratio:.2f} 倍の速さです。")
+
+    os.makedirs(args.out, exist_ok=True)
+    out_path = os.path.join(args.out, f"classify_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump({'images': len(rows), 'batch': args.batch, 'results': results},
+                  f, ensure_ascii=False, indent=2)
+    print(f"保存しました: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
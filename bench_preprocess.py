@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+license
+GNU Affero General Public License v3（AGPL v3）
+
+フレーム前処理のマイクロベンチマーク
+
+model(frame) の中で行われる前処理 (ultralytics の LetterBox → BGR→RGB →
+CHW化 → テンソル化 → float化 → /255) と、frame_preprocess.py の
+バッファを使い回す前処理を、同じフレームで比べます。
+
+1フレームあたりの時間と、tracemalloc で計った1フレームあたりの新しいメモリ確保量を表示し、
+bench_results/preprocess_<日時>.json に保存します。
+
+使い方
+python bench_preprocess.py
+python bench_preprocess.py --size 1920x1080 --imgsz 640 --frames 300
+python bench_preprocess.py --video myMovie.mp4
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+import torch
+
+from frame_preprocess import PAD_VALUE, FramePreprocessor
+
+RESULT_DIR = "bench_results"
+
+
+def letterbox_baseline(frame, imgsz=640, stride=32):
+    """ultralytics の LetterBox(auto=True) と同じ処理 (毎回新しい配列を作る)"""
+    h, w = frame.shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    nw, nh = int(round(w * r)), int(round(h * r))
+    dw, dh = (imgsz - nw) % stride / 2, (imgsz - nh) % stride / 2
+    if (nw, nh) != (w, h):
+        frame = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    return cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT,
+                              value=(PAD_VALUE, PAD_VALUE, PAD_VALUE))
+
+
+def preprocess_baseline(frame, imgsz=640):
+    """ultralytics の Predictor.preprocess と同じ流れ"""
+    try:
+        from ultralytics.data.augment import LetterBox
+        im = LetterBox((imgsz, imgsz), auto=True, stride=32)(image=frame)
+    except ImportError:
+        im = letterbox_baseline(frame, imgsz)
+    im = np.stack([im])
+    im = im[..., ::-1].transpose((0, 3, 1, 2))   # BGR→RGB, BHWC→BCHW
+    im = np.ascontiguousarray(im)
+    im = torch.from_numpy(im)
+    im = im.float()
+    im /= 255
+    return im
+
+
+def load_frames(args):
+    if args.video:
+        cap = cv2.VideoCapture(args.video)
+        frames = []
+        while len(frames) < min(args.frames, 60):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+        if not frames:
+            raise SystemExit(f"❌ エラー: 動画を読み込めません: {args.video}")
+        return frames
+    w, h = (int(v) for v in args.size.split("x"))
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (h, w, 3), dtype=np.uint8) for _ in range(8)]
+
+
+def measure(fn, frames, n):
+    """1フレームあたりの時間(ms)と新しく確保したメモリ(KB)を計る"""
+    for frame in frames[:3]:   # ウォームアップ (最初のバッファ確保を含めない)
+        fn(frame)
+    times = []
+    for i in range(n):
+        frame = frames[i % len(frames)]
+        t0 = time.perf_counter()
+        fn(frame)
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    alloc = 0
+    m = min(n, 30)
+    for i in range(m):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        out = fn(frames[i % len(frames)])
+        alloc += tracemalloc.get_traced_memory()[1] - before
+        del out
+    tracemalloc.stop()
+
+    times = np.array(times) * 1000
+    return {
+        "mean_ms": float(times.mean()),
+        "p50_ms": float(np.percentile(times, 50)),
+        "p90_ms": float(np.percentile(times, 90)),
+        "alloc_kb_per_frame": alloc / m / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="フレーム前処理のマイクロベンチマーク")
+    parser.add_argument("--size", default="1280x720", help="合成フレームの大きさ (幅x高さ)")
+    parser.add_argument("--video", default=None, help="合成フレームの代わりに使う動画")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--frames", type=int, default=200, help="計測するフレーム数")
+    parser.add_argument("--out", default=RESULT_DIR)
+    args = parser.parse_args()
+
+    frames = load_frames(args)
+    pre = FramePreprocessor(args.imgsz)
+
+    # 2つの前処理が同じ結果になることを確認
+    a = preprocess_baseline(frames[0], args.imgsz)
+    b = pre(frames[0])
+    diff = float((a - b).abs().max()) if a.shape == b.shape else float("nan")
+    print(f"フレーム {frames[0].shape[1]}x{frames[0].shape[0]} → 入力 {tuple(b.shape)}  最大誤差 {diff:.2e}")
+
+    results = {
+        "before (model(frame)の前処理)": measure(lambda f: preprocess_baseline(f, args.imgsz), frames, args.frames),
+        "after (frame_preprocess)": measure(pre, frames, args.frames),
+    }
+    print("-" * 70)
+    for name, r in results.items():
+        print(f"  {name:30s}: 平均 {r['mean_ms']:6.2f}ms  p90 {r['p90_ms']:6.2f}ms  "
+              f"確保 {r['alloc_kb_per_frame']:8.1f}KB/フレーム")
+
+    os.makedirs(args.out, exist_ok=True)
+    out_path = os.path.join(args.out, f"preprocess_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({"frame_shape": list(frames[0].shape), "imgsz": args.imgsz,
+                   "max_abs_diff": diff, "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"保存しました: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+license
+GNU Affero General Public License v3（AGPL v3）
+
+オフラインで再現できるベンチマーク
+
+ネットワークを使わずに
+・7クラスの合成データセット (data/<class>/ の形式)
+・合成動画 (myMovie.mp4)
+・合成テスト画像 (test3.png)
+を作業フォルダに作り、0_data2jpeg.py 〜 7_all_inference.py と movie_yolo.py を
+順番に実行して各ステージの時間を計ります。
+
+学習(4)はダウンロードが不要なように yolov8n.yaml からランダム初期化した
+小さなモデルで1エポックだけ行います。
+
+結果は bench_results/<日時>_<コミット>.json に保存されます。
+各スクリプトが perf_metrics.py で出力した内訳(decode/inference など)も含みます。
+
+使い方
+python benchmark.py                        # 標準設定で実行
+python benchmark.py --images 20 --frames 60
+python benchmark.py --compare bench_results/A.json bench_results/B.json
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+import config
+
+# --- 設定 ---
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+WORK_DIR = "bench_work"          # 合成データと実行結果を置く作業フォルダ
+RESULT_DIR = "bench_results"     # ベンチマーク結果(JSON)の保存先
+SEED = 0
+
+CLASSES = config.CLASSES
+
+# クラスごとの図形と色 (小さなモデルでも区別できるように)
+CLASS_STYLE = {
+    'bike':    ('ellipse', (220, 40, 40)),
+    'cars':    ('rectangle', (40, 40, 220)),
+    'cats':    ('triangle', (240, 200, 40)),
+    'dogs':    ('ellipse', (60, 180, 60)),
+    'flowers': ('triangle', (220, 60, 200)),
+    'horses':  ('rectangle', (130, 80, 30)),
+    'human':   ('ellipse', (40, 200, 220)),
+}
+
+# 元データに混ざっている形式を再現するため、拡張子を順番に使う
+SOURCE_FORMATS = [('.jpg', 'JPEG'), ('.png', 'PNG'), ('.bmp', 'BMP')]
+
+# 実行するステージ (名前, スクリプト)
+STAGES = [
+    ("0_data2jpeg", "0_data2jpeg.py"),
+    ("1_dataset_name_cut", "1_dataset_name_cut.py"),
+    ("2_data2train_val", "2_data2train_val.py"),
+    ("3_labels", "3_labels.py"),
+    ("4_train", None),               # ランダム初期化モデルで学習 (下の TRAIN_CODES)
+    ("3_cls_dataset", "3_cls_dataset.py"),
+    ("4_train_cls", None),
+    ("5_detect", "5_detect.py"),
+    ("6_random_inference", "6_random_inference.py"),
+    ("7_all_inference", "7_all_inference.py"),
+    ("bench_classify", "bench_classify.py"),
+    ("movie_yolo", "movie_yolo.py"),
+]
+
+# スクリプトを乱数固定で実行するためのラッパー
+RUN_CODE = """
+import random, runpy, sys
+random.seed({seed})
+sys.argv = [{script!r}]
+runpy.run_path({script!r}, run_name="__main__")
+"""
+
+# 4_train_8n.py の代わり: ダウンロード不要のランダム初期化モデル
+TRAIN_CODE = """
+import os
+from ultralytics import YOLO
+import config
+import perf_metrics as pm
+model = YOLO("yolov8n.yaml")
+with pm.stage("train"):
+    model.train(data=config.DATA_YAML, epochs={epochs}, imgsz={imgsz}, batch=8,
+                pretrained=False, plots=False, workers=0, device="cpu",
+                project=os.path.abspath(config.TRAIN_PROJECT), name=config.TRAIN_NAME,
+                exist_ok=True, seed={seed})
+pm.dump("4_train")
+"""
+
+# 4_train_cls.py の代わり (分類モデル)
+TRAIN_CLS_CODE = """
+import os
+from ultralytics import YOLO
+import config
+import perf_metrics as pm
+model = YOLO("yolov8n-cls.yaml")
+with pm.stage("train"):
+    model.train(data=os.path.abspath(config.CLS_DIR), epochs={epochs}, imgsz={imgsz}, batch=8,
+                pretrained=False, plots=False, workers=0, device="cpu",
+                project=os.path.abspath(config.CLS_PROJECT), name=config.TRAIN_NAME,
+                exist_ok=True, seed={seed})
+pm.dump("4_train_cls")
+"""
+
+TRAIN_CODES = {"4_train": TRAIN_CODE, "4_train_cls": TRAIN_CLS_CODE}
+
+
+# ==============================
+# 合成データの作成
+# ==============================
+def draw_object(draw, shape, color, box):
+    if shape == 'ellipse':
+        draw.ellipse(box, fill=color)
+    elif shape == 'rectangle':
+        draw.rectangle(box, fill=color)
+    else:
+        x1, y1, x2, y2 = box
+        draw.polygon([((x1 + x2) // 2, y1), (x2, y2), (x1, y2)], fill=color)
+
+
+def make_image(rng, class_name, size):
+    """クラスの図形を画像いっぱいに描いた画像を作る (3_labels.pyの中央ボックス前提に合わせる)"""
+    w = rng.randint(size * 3 // 4, size * 5 // 4)
+    h = rng.randint(size * 3 // 4, size * 5 // 4)
+    bg = tuple(rng.randint(0, 80) for _ in range(3))
+    img = Image.new('RGB', (w, h), bg)
+    draw = ImageDraw.Draw(img)
+    shape, color = CLASS_STYLE[class_name]
+    color = tuple(min(255, max(0, c + rng.randint(-30, 30))) for c in color)
+    mx, my = int(w * 0.1), int(h * 0.1)
+    draw_object(draw, shape, color, (mx, my, w - mx, h - my))
+    return img
+
+
+def make_dataset(root, n_per_class, size, seed=SEED):
+    """data/<class>/<class>_<番号>.<拡張子> の形式で合成データセットを作る"""
+    rng = random.Random(seed)
+    count = 0
+    for class_name in CLASSES:
+        class_dir = os.path.join(root, 'data', class_name)
+        os.makedirs(class_dir, exist_ok=True)
+        for i in range(n_per_class):
+            ext, fmt = SOURCE_FORMATS[i % len(SOURCE_FORMATS)]
+            img = make_image(rng, class_name, size)
+            img.save(os.path.join(class_dir, f"{class_name}_{i:05d}{ext}"), fmt)
+            count += 1
+    # 5_detect.py 用のテスト画像
+    make_image(rng, 'cats', size * 2).save(os.path.join(root, 'test3.png'))
+    return count
+
+
+def make_video(path, n_frames, width=640, height=480, fps=30, seed=SEED):
+    """図形が動き回る合成動画を作る"""
+    import cv2
+    import numpy as np
+
+    rng = random.Random(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    objects = []
+    for class_name in rng.sample(CLASSES, 3):
+        objects.append({
+            'cls': class_name,
+            'x': rng.randint(0, width - 160), 'y': rng.randint(0, height - 160),
+            'dx': rng.choice([-4, -3, 3, 4]), 'dy': rng.choice([-4, -3, 3, 4]),
+        })
+    for _ in range(n_frames):
+        frame = np.full((height, width, 3), 30, dtype=np.uint8)
+        for o in objects:
+            o['x'] = min(max(o['x'] + o['dx'], 0), width - 160)
+            o['y'] = min(max(o['y'] + o['dy'], 0), height - 160)
+            if o['x'] in (0, width - 160):
+                o['dx'] = -o['dx']
+            if o['y'] in (0, height - 160):
+                o['dy'] = -o['dy']
+            shape, (r, g, b) = CLASS_STYLE[o['cls']]
+            x1, y1, x2, y2 = o['x'], o['y'], o['x'] + 160, o['y'] + 160
+            if shape == 'ellipse':
+                cv2.ellipse(frame, ((x1 + x2) // 2, (y1 + y2) // 2), (80, 80), 0, 0, 360, (b, g, r), -1)
+            elif shape == 'rectangle':
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (b, g, r), -1)
+            else:
+                pts = np.array([[(x1 + x2) // 2, y1], [x2, y2], [x1, y2]], dtype=np.int32)
+                cv2.fillPoly(frame, [pts], (b, g, r))
+        writer.write(frame)
+    writer.release()
+
+
+# ==============================
+# ステージの実行
+# ==============================
+def run_stage(name, script, work_dir, args):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = REPO_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    env['MPLBACKEND'] = 'Agg'        # plt.show() で止まらないようにする
+    env['YOLO7_HEADLESS'] = '1'      # movie_yolo.py をウィンドウなしで動かす
+    env.pop('YOLO7_METRICS_PORT', None)
+    if script is None:
+        code = TRAIN_CODES[name].format(epochs=args.epochs, imgsz=args.imgsz, seed=SEED)
+    else:
+        code = RUN_CODE.format(seed=SEED, script=os.path.join(REPO_DIR, script))
+
+    log_path = os.path.join(work_dir, 'logs', name + '.log')
+    t0 = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        proc = subprocess.run([sys.executable, '-c', code], cwd=work_dir, env=env,
+                              stdout=log, stderr=subprocess.STDOUT)
+    wall = time.perf_counter() - t0
+
+    # perf_metrics.py が出力した内訳を取り込む
+    metrics = None
+    metrics_path = os.path.join(work_dir, 'metrics', name + '.json')
+    if os.path.exists(metrics_path):
+        with open(metrics_path, encoding='utf-8') as f:
+            metrics = json.load(f)
+    return {'wall_s': wall, 'returncode': proc.returncode, 'log': log_path, 'metrics': metrics}
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                             capture_output=True, text=True)
+        commit = out.stdout.strip() or 'unknown'
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except OSError:
+        return 'unknown'
+
+
+def run_benchmark(args):
+    work_dir = os.path.abspath(args.work)
+    if os.path.exists(work_dir):
+        shutil.rmtree(work_dir)
+    os.makedirs(os.path.join(work_dir, 'logs'))
+
+    print(f"作業フォルダ: {work_dir}")
+    t0 = time.perf_counter()
+    n_images = make_dataset(work_dir, args.images, args.size)
+    make_video(os.path.join(work_dir, 'myMovie.mp4'), args.frames)
+    config.write_data_yaml(os.path.join(work_dir, config.DATA_YAML))
+    gen_time = time.perf_counter() - t0
+    print(f"合成データ作成: 画像 {n_images}枚, 動画 {args.frames}フレーム ({gen_time:.1f}秒)")
+    print("-" * 50)
+
+    selected = args.stages.split(',') if args.stages else None
+    stages = {}
+    for name, script in STAGES:
+        if selected and name not in selected:
+            continue
+        result = run_stage(name, script, work_dir, args)
+        stages[name] = result
+        mark = "✅" if result['returncode'] == 0 else "❌"
+        print(f"  {mark} {name:20s}: {result['wall_s']:7.2f}秒")
+        if result['returncode'] != 0:
+            print(f"     ログ: {result['log']}")
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'params': {
+            'images_per_class': args.images, 'image_size': args.size,
+            'frames': args.frames, 'epochs': args.epochs, 'imgsz': args.imgsz, 'seed': SEED,
+        },
+        'generate_s': gen_time,
+        'stages': stages,
+    }
+    os.makedirs(args.out, exist_ok=True)
+    out_path = os.path.join(args.out, f"{time.strftime('%Y%m%d_%H%M%S')}_{report['commit']}.json")
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print("-" * 50)
+    print(f"🎉 結果を保存しました: {out_path}")
+
+    if not args.keep:
+        shutil.rmtree(work_dir)
+    return report
+
+
+def compare(path_a, path_b):
+    """2つの結果ファイルのステージ時間を比較表示する"""
+    with open(path_a, encoding='utf-8') as f:
+        a = json.load(f)
+    with open(path_b, encoding='utf-8') as f:
+        b = json.load(f)
+    print(f"A: {a['commit']} ({a['timestamp']})")
+    print(f"B: {b['commit']} ({b['timestamp']})")
+    if a.get('params') != b.get('params'):
+        print("⚠️ 警告: 実行条件(params)が異なります。")
+    print("-" * 50)
+    for name, _ in STAGES:
+        if name not in a['stages'] or name not in b['stages']:
+            continue
+        ta = a['stages'][name]['wall_s']
+        tb = b['stages'][name]['wall_s']
+        ratio = (tb / ta - 1) * 100 if ta > 0 else 0
+        print(f"  {name:20s}: {ta:7.2f}秒 -> {tb:7.2f}秒 ({ratio:+6.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成データによるパイプラインのベンチマーク")
+    parser.add_argument('--images', type=int, default=40, help="クラスあたりの画像数")
+    parser.add_argument('--size', type=int, default=256, help="合成画像のおおよその一辺(px)")
+    parser.add_argument('--frames', type=int, default=150, help="合成動画のフレーム数")
+    parser.add_argument('--epochs', type=int, default=1, help="学習エポック数")
+    parser.add_argument('--imgsz', type=int, default=64, help="学習時の画像サイズ")
+    parser.add_argument('--stages', default=None, help="実行するステージをカンマ区切りで指定")
+    parser.add_argument('--work', default=WORK_DIR, help="作業フォルダ")
+    parser.add_argument('--out', default=RESULT_DIR, help="結果の保存先フォルダ")
+    parser.add_argument('--keep', action='store_true', help="作業フォルダを残す")
+    parser.add_argument('--compare', nargs=2, metavar=('A', 'B'), help="2つの結果を比較する")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        run_benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+license
+GNU Affero General Public License v3（AGPL v3）
+
+データセットの目録 (SQLite)
+
+画像ごとに
+  name   ファイル名 (例: bike_123.jpg)
+  class  クラス名
+  split  train / val
+  path   dataset_tv 内のパス
+  width, height  画像サイズ
+  size, mtime_ns ファイルサイズと更新時刻 (変化の検出用)
+  hash   ファイル内容のハッシュ
+を記録し、labels テーブルにバウンディングボックスを記録します。
+predictions テーブルには 7_all_inference.py / hard_mining.py の判定結果
+(モデル・予測クラス・信頼度・正解か) を画像ごとに記録します。
+
+2_data2train_val.py が画像を登録し、3_labels.py がサイズとラベルを書き込みます。
+6_random_inference.py と 7_all_inference.py はフォルダを走査せずにここから画像を選びます。
+
+目録がない(古い手順で dataset_tv を作った)場合は sync_dir() で一度だけ走査して作ります。
+"""
+import hashlib
+import os
+import random
+import sqlite3
+
+import config
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id       INTEGER PRIMARY KEY,
+    name     TEXT NOT NULL UNIQUE,
+    class    TEXT NOT NULL,
+    split    TEXT NOT NULL,
+    path     TEXT NOT NULL,
+    width    INTEGER,
+    height   INTEGER,
+    size     INTEGER,
+    mtime_ns INTEGER,
+    hash     TEXT
+);
+CREATE INDEX IF NOT EXISTS images_split_class ON images (split, class);
+CREATE INDEX IF NOT EXISTS images_split_name ON images (split, name);
+CREATE INDEX IF NOT EXISTS images_split_id ON images (split, id);
+CREATE TABLE IF NOT EXISTS labels (
+    image_id INTEGER NOT NULL REFERENCES images (id) ON DELETE CASCADE,
+    class_id INTEGER NOT NULL,
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    w REAL NOT NULL,
+    h REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS labels_image ON labels (image_id);
+CREATE TABLE IF NOT EXISTS predictions (
+    image_id INTEGER PRIMARY KEY REFERENCES images (id) ON DELETE CASCADE,
+    model    TEXT NOT NULL,
+    pred     TEXT,
+    conf     REAL,
+    margin   REAL,
+    correct  INTEGER
+);
+"""
+
+
+def connect(path=None):
+    """目録を開く (なければ作る)"""
+    conn = sqlite3.connect(path or config.CATALOG_PATH)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """ファイル内容のハッシュ (sha1)"""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def class_from_name(name):
+    """ファイル名のプレフィックスからクラス名を求める (目録がない時の走査用)"""
+    name = name.lower()
+    for cls in config.CLASSES:
+        if name.startswith(cls.lower() + '_'):
+            return cls
+    return None
+
+
+# ==============================
+# 書き込み
+# ==============================
+def upsert_image(conn, name, cls, split, path, file_digest=None, width=None, height=None):
+    """画像を登録・更新し、idを返す (サイズ・更新時刻が変わっていればハッシュと寸法を消す)"""
+    st = os.stat(path)
+    row = conn.execute("SELECT id, size, mtime_ns FROM images WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        cur = conn.execute(
+            "INSERT INTO images (name, class, split, path, width, height, size, mtime_ns, hash)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (name, cls, split, path, width, height, st.st_size, st.st_mtime_ns, file_digest))
+        return cur.lastrowid
+    changed = (row['size'], row['mtime_ns']) != (st.st_size, st.st_mtime_ns)
+    if changed:
+        conn.execute("DELETE FROM labels WHERE image_id = ?", (row['id'],))
+    conn.execute(
+        "UPDATE images SET class = ?, split = ?, path = ?, size = ?, mtime_ns = ?,"
+        " hash = COALESCE(?, CASE WHEN ? THEN NULL ELSE hash END),"
+        " width = COALESCE(?, CASE WHEN ? THEN NULL ELSE width END),"
+        " height = COALESCE(?, CASE WHEN ? THEN NULL ELSE height END)"
+        " WHERE id = ?",
+        (cls, split, path, st.st_size, st.st_mtime_ns,
+         file_digest, changed, width, changed, height, changed, row['id']))
+    return row['id']
+
+
+def set_size(conn, image_id, width, height):
+    conn.execute("UPDATE images SET width = ?, height = ? WHERE id = ?", (width, height, image_id))
+
+
+def set_labels(conn, image_id, boxes):
+    """ラベルを置き換える  boxes: [(class_id, x, y, w, h), ...] (YOLO形式)"""
+    conn.execute("DELETE FROM labels WHERE image_id = ?", (image_id,))
+    conn.executemany("INSERT INTO labels (image_id, class_id, x, y, w, h) VALUES (?, ?, ?, ?, ?, ?)",
+                     [(image_id, *box) for box in boxes])
+
+
+def record_prediction(conn, image_id, model, pred, conf, margin, correct):
+    """判定結果を記録する (画像ごとに最新の1件だけ残す)"""
+    conn.execute("INSERT OR REPLACE INTO predictions (image_id, model, pred, conf, margin, correct)"
+                 " VALUES (?, ?, ?, ?, ?, ?)", (image_id, model, pred, conf, margin, int(correct)))
+
+
+def remove_image(conn, name):
+    conn.execute("DELETE FROM images WHERE name = ?", (name,))
+
+
+def sync_dir(conn, split, directory):
+    """
+    フォルダを走査して目録を最新にする (サイズ・更新時刻が同じ画像は読み直さない)
+    目録にあってフォルダにない画像は削除する
+    """
+    seen = set()
+    added = 0
+    with conn:
+        for entry in os.scandir(directory):
+            name = entry.name
+            if not name.lower().endswith(IMAGE_EXTENSIONS) or name.startswith('._'):
+                continue
+            cls = class_from_name(name)
+            if cls is None:
+                continue
+            seen.add(name)
+            upsert_image(conn, name, cls, split, entry.path)
+            added += 1
+        known = [r['name'] for r in conn.execute("SELECT name FROM images WHERE split = ?", (split,))]
+        for name in known:
+            if name not in seen:
+                remove_image(conn, name)
+    return added
+
+
+# ==============================
+# 読み出し
+# ==============================
+def count(conn, split, cls=None):
+    if cls is None:
+        return conn.execute("SELECT COUNT(*) FROM images WHERE split = ?", (split,)).fetchone()[0]
+    return conn.execute("SELECT COUNT(*) FROM images WHERE split = ? AND class = ?",
+                        (split, cls)).fetchone()[0]
+
+
+def list_split(conn, split, cls=None):
+    """split (とクラス) の画像を name 順で返す"""
+    if cls is None:
+        return conn.execute("SELECT * FROM images WHERE split = ? ORDER BY name", (split,)).fetchall()
+    return conn.execute("SELECT * FROM images WHERE split = ? AND class = ? ORDER BY name",
+                        (split, cls)).fetchall()
+
+
+def ids(conn, split, cls=None):
+    if cls is None:
+        rows = conn.execute("SELECT id FROM images WHERE split = ?", (split,))
+    else:
+        rows = conn.execute("SELECT id FROM images WHERE split = ? AND class = ?", (split, cls))
+    return [r[0] for r in rows]
+
+
+def get(conn, image_ids):
+    """idのリストから画像の行を取り出す (順番は引数のまま)"""
+    rows = {}
+    image_ids = list(image_ids)
+    for i in range(0, len(image_ids), 500):   # SQLiteの変数の上限に引っかからないように分ける
+        chunk = image_ids[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+        for r in conn.execute(f"SELECT * FROM images WHERE id IN ({marks})", chunk):
+            rows[r['id']] = r
+    return [rows[i] for i in image_ids if i in rows]
+
+
+def sample(conn, split, k=1, cls=None, rng=random):
+    """split からランダムに k 枚選ぶ (フォルダは走査しない)"""
+    if k <= 16:
+        # 少ない枚数は id 順の位置(OFFSET)で1行ずつ取り出す
+        # インデックスを id 順にたどるので並べ替えはないが、OFFSET の位置までは1行ずつ数えて進む
+        # (全件の id を Python に読み込むよりは速い)
+        n = count(conn, split, cls)
+        where, params = ("split = ?", (split,)) if cls is None else ("split = ? AND class = ?", (split, cls))
+        return [conn.execute(f"SELECT * FROM images WHERE {where} ORDER BY id LIMIT 1 OFFSET ?",
+                             (*params, i)).fetchone()
+                for i in rng.sample(range(n), min(k, n))]
+    population = ids(conn, split, cls)
+    return get(conn, rng.sample(population, min(k, len(population))))
+
+
+def labels(conn, image_id):
+    return conn.execute("SELECT class_id, x, y, w, h FROM labels WHERE image_id = ?",
+                        (image_id,)).fetchall()
+
+
+def predictions(conn, split, model=None):
+    """split の判定結果を画像の情報といっしょに返す (model を指定するとそのモデルの結果だけ)"""
+    sql = ("SELECT images.*, predictions.model, predictions.pred, predictions.conf,"
+           " predictions.margin, predictions.correct"
+           " FROM predictions JOIN images ON images.id = predictions.image_id WHERE images.split = ?")
+    if model is None:
+        return conn.execute(sql, (split,)).fetchall()
+    return conn.execute(sql + " AND predictions.model = ?", (split, model)).fetchall()
+
+
+def model_id(path):
+    """
+    モデルファイルを区別するための短いID (内容のハッシュ)
+    openvino などフォルダになっている形式は、中のファイルの名前と内容から求める
+    """
+    if not os.path.isdir(path):
+        return file_hash(path)[:12]
+    h = hashlib.sha1()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            h.update(os.path.relpath(file_path, path).encode("utf-8", "surrogateescape"))
+            h.update(file_hash(file_path).encode())
+    return h.hexdigest()[:12]
+
+
+def ensure_split(conn, split, directory):
+    """目録に split の画像がなければ、フォルダを一度だけ走査して作る"""
+    if count(conn, split) == 0 and os.path.isdir(directory):
+        n = sync_dir(conn, split, directory)
+        print(f"📚 目録がないので '{directory}' を走査して {n} 枚登録しました。")
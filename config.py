@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+license
+GNU Affero General Public License v3（AGPL v3）
+
+パイプライン共通の設定
+
+クラス名やフォルダのパスは各スクリプトがここから読み込みます。
+data.yaml も pipeline.py がこの設定から作り直します。
+"""
+import os
+
+# 処理対象とするクラス名 (フォルダ名・ファイル名のプレフィックスと一致させる)
+# 並び順がそのままYOLOのクラスIDになります
+CLASSES = ['bike', 'cars', 'cats', 'dogs', 'flowers', 'horses', 'human']
+
+# --- フォルダ ---
+DATA_DIR = "data"            # 解凍した元データ
+JPEG_DIR = "dataset_j"       # 0_data2jpeg.py の出力 (jpgに統一したもの)
+TV_DIR = "dataset_tv"        # 2_data2train_val.py の出力 (train/valに分けたもの)
+LABEL_DIR = "dataset_l"      # 3_labels.py の出力 (YOLO形式のラベル付き)
+CLS_DIR = "dataset_c"        # 3_cls_dataset.py の出力 (分類用 train/val/<クラス名>/)
+SPLITS = ['train', 'val']
+
+# 画像の目録 (catalog.py)
+CATALOG_PATH = "catalog.sqlite3"
+
+# --- 学習 ---
+DATA_YAML = "data.yaml"
+TRAIN_MODEL = "yolov8n.pt"   # 学習のもとにするモデル
+TRAIN_EPOCHS = 2
+TRAIN_IMGSZ = 128
+TRAIN_PROJECT = "runs/detect"
+TRAIN_NAME = "train"
+
+# 学習に使う data.yaml (サブセットで学習する時は SUBSET_YAML にする)
+TRAIN_DATA = DATA_YAML
+
+# 学習速度(1秒あたりの画像数)の記録 (4_train_8n.py が書き、subset_sampler.py が読む)
+THROUGHPUT_FILE = os.path.join("runs", "throughput.json")
+
+# 学習済みモデル (best.pt) のパス
+MODEL_PATH = os.path.join(TRAIN_PROJECT, TRAIN_NAME, "weights", "best.pt")
+
+# --- 分類モード (画像1枚に1つの物体なので、検出の代わりに分類モデルを使う) ---
+# TASK = "classify" にすると pipeline.py は 3_cls_dataset → 4_train_cls で学習し、
+# 7_all_inference.py は分類モデルで判定します
+TASK = "detect"
+CLS_MODEL = "yolov8n-cls.pt"
+CLS_IMGSZ = 128              # 検出と比べやすいように同じ大きさ (分類モデルの標準は 224)
+CLS_PROJECT = "runs/classify"
+CLS_MODEL_PATH = os.path.join(CLS_PROJECT, TRAIN_NAME, "weights", "best.pt")
+
+# --- 推論 ---
+INFER_IMGSZ = None        # 動画の推論で使う画像サイズ (None なら学習した時の画像サイズ、model(frame) と同じ)
+
+# --- 推論の画像サイズの比較 (imgsz_sweep.py) ---
+SWEEP_DIR = os.path.join("runs", "sweep")     # 結果と、選んだ設定 chosen_<detect|classify>.json の保存先
+SWEEP_IMGSZ = [128, 160, 224, 256, 320]
+USE_SWEEP = True          # 選んだ設定があれば movie_yolo.py と 7_all_inference.py で使う
+
+# --- 学習用サブセット (subset_sampler.py) ---
+SUBSET_LIST = os.path.join(LABEL_DIR, "subset_train.txt")   # 学習に使う画像のリスト
+SUBSET_YAML = "data_subset.yaml"
+SUBSET_IMAGES = None      # 目標の画像数 (None なら SUBSET_MINUTES から決める)
+SUBSET_MINUTES = 5        # 目標の学習時間(分)
+
+# --- 間違えやすい画像の学習データ (hard_mining.py) ---
+MINED_LIST = os.path.join(LABEL_DIR, "mined_train.txt")
+MINED_YAML = "data_mined.yaml"
+
+# --- エクスポート ---
+EXPORT_FORMAT = "onnx"
+
+
+def class_ids():
+    """クラス名 -> クラスID の辞書"""
+    return {name: i for i, name in enumerate(CLASSES)}
+
+
+def task_model_path(task=None):
+    """TASK (detect / classify) に合わせた学習済みモデルのパス"""
+    return CLS_MODEL_PATH if (task or TASK) == "classify" else MODEL_PATH
+
+
+def write_data_yaml(path=DATA_YAML, train=None, val=None):
+    """YOLOの学習に使う data.yaml を書き出す"""
+    train = train or f"./{LABEL_DIR}/images/train"
+    val = val or f"./{LABEL_DIR}/images/val"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"train: {train}\n")
+        f.write(f"val: {val}\n")
+        f.write(f"nc: {len(CLASSES)}\n")
+        f.write(f"names: {CLASSES}\n")
+    return path
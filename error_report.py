@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+license
+GNU Affero General Public License v3（AGPL v3）
+
+誤判定画像のレポート (7_all_inference.py から使います)
+
+誤判定した画像をそのままコピーする代わりに、小さなサムネイルを作り
+(正解クラス, 予測クラス) の組み合わせごとに1枚のHTMLにまとめます。
+
+result_err/
+├── index.html                 組み合わせごとの枚数の一覧
+├── cats__dogs.html            正解cats・予測dogs の画像と信頼度
+├── ...
+└── thumbs/<ハッシュ>.jpg      サムネイル (画像の内容が同じなら次回も使い回す)
+
+サムネイルは推論とは別のスレッドで並列に作ります
+(内容が同じ画像は1回だけ作り、一時ファイルはスレッドごとに別の名前にします)。
+"""
+import html
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+import catalog
+import perf_metrics as pm
+
+# --- 設定 ---
+THUMB_SIZE = 160      # サムネイルの最大の一辺(px)
+THUMB_QUALITY = 80
+WORKERS = 4           # サムネイルを作るスレッド数
+
+
+def make_thumbnail(src_path, thumb_dir, digest=None, size=THUMB_SIZE):
+    """サムネイルを作り、そのファイル名を返す (同じ内容のものがあれば作らない)"""
+    digest = digest or catalog.file_hash(src_path)
+    name = f"{digest}_{size}.jpg"
+    thumb_path = os.path.join(thumb_dir, name)
+    if os.path.exists(thumb_path):
+        pm.count("thumb_cached")
+        return name
+    with pm.stage("thumbnail"):
+        img = Image.open(src_path)
+        img.draft('RGB', (size, size))   # JPEGは縮小しながら読み込む
+        img = img.convert('RGB')
+        img.thumbnail((size, size))
+        # 同じ内容の画像を別のスレッドが同時に書いても壊れないように、一時ファイルは毎回別の名前にする
+        fd, tmp_path = tempfile.mkstemp(dir=thumb_dir, prefix=name + ".", suffix=".tmp")
+        os.close(fd)
+        try:
+            img.save(tmp_path, 'JPEG', quality=THUMB_QUALITY)
+            os.replace(tmp_path, thumb_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    pm.count("thumb_created")
+    return name
+
+
+class ErrorReport:
+    """誤判定画像を集めてHTMLレポートを作る"""
+
+    def __init__(self, out_dir, workers=WORKERS, size=THUMB_SIZE):
+        self.out_dir = out_dir
+        self.thumb_dir = os.path.join(out_dir, "thumbs")
+        self.size = size
+        os.makedirs(self.thumb_dir, exist_ok=True)
+        # 前回のHTMLだけ消す (サムネイルは使い回す)
+        for name in os.listdir(out_dir):
+            if name.endswith(".html"):
+                os.remove(os.path.join(out_dir, name))
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.items = {}   # (正解, 予測) -> [(画像パス, 信頼度, future), ...]
+        self.thumbs = {}  # ハッシュ -> future (同じ内容の画像はサムネイルを1回だけ作る)
+
+    def add(self, img_path, true_cls, pred_cls, conf, digest=None):
+        """誤判定画像を登録する (サムネイル作成は別スレッド)"""
+        future = self.thumbs.get(digest) if digest else None
+        if future is None:
+            future = self.pool.submit(make_thumbnail, img_path, self.thumb_dir, digest, self.size)
+            if digest:
+                self.thumbs[digest] = future
+        self.items.setdefault((true_cls, pred_cls), []).append((img_path, conf, future))
+
+    def close(self):
+        """サムネイルの完成を待ってHTMLを書き出す。index.html のパスを返す"""
+        pages = []
+        for (true_cls, pred_cls), items in sorted(self.items.items()):
+            cards = []
+            for img_path, conf, future in sorted(items, key=lambda x: -x[1]):
+                try:
+                    thumb = future.result()
+                except Exception as e:
+                    print(f"⚠️ サムネイル作成失敗: {img_path} -> {e}")
+                    continue
+                name = html.escape(os.path.basename(img_path))
+                cards.append(
+                    f'<figure><img src="thumbs/{thumb}" loading="lazy" title="{html.escape(img_path)}">'
+                    f'<figcaption>{name}<br>{pred_cls} {conf:.2f}</figcaption></figure>')
+            page = f"{true_cls}__{pred_cls}.html"
+            title = f"正解: {true_cls} / 予測: {pred_cls} ({len(items)}枚)"
+            with pm.stage("io"):
+                self._write(page, title, "\n".join(cards))
+            pages.append((true_cls, pred_cls, len(items), page))
+        self.pool.shutdown()
+
+        rows = "\n".join(
+            f'<tr><td>{t}</td><td>{p}</td><td>{n}</td><td><a href="{page}">表示</a></td></tr>'
+            for t, p, n, page in pages)
+        table = f"<table><tr><th>正解</th><th>予測</th><th>枚数</th><th></th></tr>\n{rows}\n</table>"
+        self._write("index.html", "誤判定レポート", table)
+        return os.path.join(self.out_dir, "index.html")
+
+    def _write(self, name, title, body):
+        with open(os.path.join(self.out_dir, name), "w", encoding="utf-8") as f:
+            f.write(
+                '<!DOCTYPE html>\n<html lang="ja"><head><meta charset="utf-8">'
+                f"<title>{html.escape(title)}</title><style>"
+                "body{font-family:sans-serif}figure{display:inline-block;margin:4px;text-align:center;"
+                "font-size:12px}td,th{padding:2px 8px}</style></head><body>"
+                f'<h2>{html.escape(title)}</h2><p><a href="index.html">一覧</a></p>\n{body}\n</body></html>\n')
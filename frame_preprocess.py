@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+license
+GNU Affero General Public License v3（AGPL v3）
+
+動画フレーム用の前処理 (バッファを使い回す版)
+
+model(frame) にフレームを渡すと、毎フレーム
+  レターボックス(縮小+余白) → BGR→RGB → HWC→CHW → float化・正規化 → テンソル作成
+でそれぞれ新しい配列が作られ、results[0].plot() でもフレームがコピーされます。
+
+ここでは最初のフレームで必要なバッファを一度だけ確保し、
+  ・cv2.resize でレターボックスの中央部分に直接書き込む (余白は最初に一度だけ塗る)
+  ・BGR→RGB・CHW化・1/255 を np.multiply(out=...) の1回で行う
+  ・torch.from_numpy でバッファをそのままテンソルとして推論(AutoBackend)に渡す
+  ・NMSの結果を元のフレームの座標に戻し、フレームに直接描く
+ので、フレームごとの配列の確保がなくなります。
+
+movie_yolo.py で使います。bench_preprocess.py で前後の時間を比べられます。
+"""
+import cv2
+import numpy as np
+
+PAD_VALUE = 114   # 余白の色 (ultralytics と同じ)
+
+
+class FramePreprocessor:
+    """
+    フレームをレターボックスして (1, 3, H, W) の float32 テンソルにする
+    同じ大きさのフレームが続く限り、バッファは使い回す
+    """
+
+    def __init__(self, imgsz=640, stride=32, auto=True):
+        self.imgsz = imgsz
+        self.stride = stride
+        self.auto = auto          # True: 余白を stride の倍数までにする (ultralytics の rect 推論と同じ)
+        self.frame_shape = None
+
+    def _allocate(self, frame_shape):
+        import torch
+
+        h, w = frame_shape[:2]
+        r = min(self.imgsz / h, self.imgsz / w)
+        nw, nh = int(round(w * r)), int(round(h * r))
+        dw, dh = self.imgsz - nw, self.imgsz - nh
+        if self.auto:
+            dw, dh = dw % self.stride, dh % self.stride
+        dw, dh = dw / 2, dh / 2
+        top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+        left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+
+        self.frame_shape = frame_shape
+        self.ratio = r
+        self.pad = (left, top)
+        self.input_shape = (nh + top + bottom, nw + left + right)
+        # レターボックス画像 (BGR, uint8) 余白はここで一度だけ塗る
+        self.canvas = np.full((*self.input_shape, 3), PAD_VALUE, dtype=np.uint8)
+        self.view = self.canvas[top:top + nh, left:left + nw]
+        self.same_size = (nw, nh) == (w, h)
+        # 推論に渡す (1, 3, H, W) float32 とそれを共有するテンソル
+        self.chw = np.empty((1, 3, *self.input_shape), dtype=np.float32)
+        self.tensor = torch.from_numpy(self.chw)
+        self.device_tensor = None
+        self.scale = np.float32(1 / 255)
+
+    def __call__(self, frame):
+        """フレーム(BGR, HWC, uint8)を推論用テンソルにする (返すテンソルは次の呼び出しで上書きされる)"""
+        if frame.shape != self.frame_shape:
+            self._allocate(frame.shape)
+        if self.same_size:
+            self.view[...] = frame
+        else:
+            out = cv2.resize(frame, (self.view.shape[1], self.view.shape[0]),
+                             dst=self.view, interpolation=cv2.INTER_LINEAR)
+            if out is not self.view and not np.shares_memory(out, self.canvas):
+                # OpenCV が dst を使えなかった場合 (通常は起きない)
+                self.view[...] = out
+        # BGR→RGB, HWC→CHW, 0〜1 への正規化を1回で行う
+        for c in range(3):
+            np.multiply(self.canvas[:, :, 2 - c], self.scale, out=self.chw[0, c])
+        return self.tensor
+
+    def to(self, device, half=False):
+        """
+        推論するデバイスに合わせたテンソルを返す (CPUならコピーなし)
+        GPUの場合もデバイス側のテンソルは一度だけ確保する
+        """
+        if device.type == "cpu" and not half:
+            return self.tensor
+        if self.device_tensor is None or self.device_tensor.shape != self.tensor.shape:
+            import torch
+            dtype = torch.float16 if half else torch.float32
+            self.device_tensor = torch.empty(self.tensor.shape, dtype=dtype, device=device)
+        self.device_tensor.copy_(self.tensor, non_blocking=True)
+        return self.device_tensor
+
+    def scale_boxes(self, xyxy):
+        """レターボックス座標の (N, 4) xyxy を元のフレームの座標に戻す (その場で書き換える)"""
+        left, top = self.pad
+        xs, ys = xyxy[:, 0::2], xyxy[:, 1::2]   # x1,x2 と y1,y2 (どちらもビュー)
+        xs -= left
+        ys -= top
+        xyxy /= self.ratio
+        h, w = self.frame_shape[:2]
+        np.clip(xs, 0, w, out=xs)
+        np.clip(ys, 0, h, out=ys)
+        return xyxy
+
+
+def load_backend(model_path, device="cpu", half=False):
+    """学習済みモデルを ultralytics の AutoBackend で読み込む (前処理・Resultsを通さずに推論するため)"""
+    import torch
+    from ultralytics.nn.autobackend import AutoBackend
+
+    backend = AutoBackend(model_path, device=torch.device(device), fp16=half, fuse=True, verbose=False)
+    backend.eval()
+    return backend
+
+
+def _nms():
+    try:
+        from ultralytics.utils.ops import non_max_suppression
+    except ImportError:
+        from ultralytics.utils.nms import non_max_suppression
+    return non_max_suppression
+
+
+class FrameDetector:
+    """FramePreprocessor + AutoBackend + NMS で1フレームずつ検出する"""
+
+    def __init__(self, model_path, imgsz=640, conf=0.25, iou=0.7, device="cpu", half=False):
+        self.backend = load_backend(model_path, device, half)
+        self.names = self.backend.names
+        # PyTorchのモデル(.pt)だけは入力の大きさが自由なので、余白を最小にする (ultralytics と同じ)
+        is_pt = getattr(self.backend, "format", None) == "pt" or getattr(self.backend, "pt", False)
+        self.pre = FramePreprocessor(imgsz, stride=max(int(self.backend.stride), 32), auto=is_pt)
+        self.conf = conf
+        self.iou = iou
+        self.half = half
+        self.nms = _nms()
+
+    def preprocess(self, frame):
+        self.pre(frame)
+        return self.pre.to(self.backend.device, self.half)
+
+    def infer(self, tensor):
+        import torch
+        with torch.inference_mode():
+            return self.backend(tensor)
+
+    def postprocess(self, preds):
+        """NMSして (xyxy[N,4] 元フレーム座標, conf[N], cls[N]) を numpy で返す"""
+        det = self.nms(preds, self.conf, self.iou, max_det=300)[0].cpu().numpy()
+        xyxy = self.pre.scale_boxes(det[:, :4])
+        return xyxy, det[:, 4], det[:, 5].astype(int)
+
+
+def draw_boxes(frame, xyxy, confs, cls_ids, names, color=(0, 255, 0)):
+    """検出結果をフレームに直接描く (コピーしない)"""
+    for (x1, y1, x2, y2), conf, cls in zip(xyxy.astype(int), confs, cls_ids):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, f"{names[cls]} {conf:.2f}", (x1, max(y1 - 6, 12)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    return frame
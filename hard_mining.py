@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+license
+GNU Affero General Public License v3（AGPL v3）
+
+間違えやすい画像を集めて、次の学習データを作ります (ハードサンプルマイニング)
+
+検出モード (config.TASK = "detect") 専用です。
+書き出すリストは 4_train_8n.py 用 (dataset_l の画像) なので、分類モードでは何もしません。
+
+1. 学習済みの検出モデルで train の画像をまとめて推論し、判定結果と信頼度を目録に記録
+   (7_all_inference.py と同じ推論・同じ設定 (imgsz_sweep.py で選んだモデル・画像サイズ・スレッド数)、
+    同じモデル・設定で記録済みの画像は推論し直さない)
+2. 次の画像を選ぶ
+   ・間違えた画像            (hard)
+   ・正解だが自信がない画像   (uncertain: 信頼度が低い、または2位のクラスとの差が小さい)
+   ・それ以外から少しだけ     (replay: 覚えたことを忘れないように)
+3. dataset_l/mined_train.txt と data_mined.yaml に書き出す (画像はコピーしない)
+
+val の結果 (7_all_inference.py が記録) は表示するだけで、学習データには入れません。
+
+使い方
+python 7_all_inference.py
+python hard_mining.py
+python 4_train_8n.py data_mined.yaml
+
+pipeline.py では 7_all_inference の後に実行します。
+
+学習は前回の best.pt から続けると、少ない画像でも短時間で改善できます
+(config.py の TRAIN_MODEL を config.MODEL_PATH にする)。
+"""
+import argparse
+import os
+import random
+
+from ultralytics import YOLO
+
+import catalog
+import config
+import perf_metrics as pm
+import subset_sampler
+import yolo_eval
+
+# --- 設定 ---
+MINED_LIST = config.MINED_LIST
+MINED_YAML = config.MINED_YAML
+UNCERTAIN_CONF = 0.5     # これより信頼度が低い正解は「自信がない」とする
+UNCERTAIN_MARGIN = 0.2   # 2位のクラスとの信頼度の差がこれより小さい正解も「自信がない」とする
+REPLAY_RATIO = 0.1       # 残りの画像から混ぜる割合
+SEED = 0
+
+
+def predict_split(conn, model, model_id, split, **predict_args):
+    """split の画像のうち、このモデルで未判定のものを推論して目録に記録する"""
+    done = {r['id'] for r in catalog.predictions(conn, split, model_id)}
+    rows = {r['path']: r for r in catalog.list_split(conn, split) if r['id'] not in done}
+    print(f"{split}: 推論 {len(rows)}枚 (記録済み {len(done)}枚)")
+    for i, (path, pred, conf, margin) in enumerate(yolo_eval.predict_top1(model, rows, **predict_args), 1):
+        if pred is None:
+            continue
+        row = rows[path]
+        catalog.record_prediction(conn, row['id'], model_id, pred, conf, margin, pred == row['class'].lower())
+        if i % 1000 == 0:
+            conn.commit()
+            print(f"  {i}/{len(rows)}枚")
+    conn.commit()
+
+
+def select(rows, uncertain_conf, uncertain_margin, replay_ratio, rng):
+    """判定結果から hard / uncertain / replay の画像名を選ぶ"""
+    hard, uncertain, rest = [], [], []
+    for r in rows:
+        if not r['correct']:
+            hard.append(r['name'])
+        elif r['conf'] < uncertain_conf or r['margin'] < uncertain_margin:
+            uncertain.append(r['name'])
+        else:
+            rest.append(r['name'])
+    replay = rng.sample(rest, int(len(rest) * replay_ratio))
+    return hard, uncertain, replay
+
+
+def summary(rows, title):
+    total = len(rows)
+    correct = sum(1 for r in rows if r['correct'])
+    if total:
+        print(f"{title}: 正解率 {correct / total * 100:.1f}% ({correct}/{total})")
+
+
+def mine(args):
+    if config.TASK == "classify":
+        print("⚠️ 警告: hard_mining.py は検出モード専用です (config.TASK = \"classify\")。何もしません。")
+        return None
+    # 7_all_inference.py と同じ設定で推論し、同じIDで記録する (val の結果と比べられるように)
+    settings = yolo_eval.inference_settings()
+    model_path = settings['model']
+    yolo_eval.set_threads(settings['threads'])
+    model = YOLO(model_path, task=None if model_path.endswith('.pt') else config.TASK)
+    predict_args = {'imgsz': settings['imgsz']} if settings['imgsz'] else {}
+    model_id = yolo_eval.record_id(settings)
+    conn = catalog.connect()
+    catalog.ensure_split(conn, 'train', os.path.join(config.TV_DIR, 'images', 'train'))
+
+    summary(catalog.predictions(conn, 'val', model_id), "val (7_all_inference.py)")
+
+    predict_split(conn, model, model_id, 'train', **predict_args)
+    rows = catalog.predictions(conn, 'train', model_id)
+    summary(rows, "train")
+
+    hard, uncertain, replay = select(rows, args.conf, args.margin, args.replay, random.Random(args.seed))
+    names = sorted(set(hard + uncertain + replay))
+    conn.close()
+    if not names:
+        print("選ばれた画像がありません。")
+        return None
+
+    subset_sampler.write_list(names, MINED_LIST, MINED_YAML)
+    pm.count("hard", len(hard))
+    pm.count("uncertain", len(uncertain))
+    pm.count("replay", len(replay))
+    print("-" * 40)
+    print(f"  間違えた画像     : {len(hard)}枚")
+    print(f"  自信がない画像   : {len(uncertain)}枚")
+    print(f"  replay           : {len(replay)}枚")
+    print(f"🎉 {len(names)}枚 (train全体の {len(names) / max(len(rows), 1) * 100:.1f}%) を {MINED_LIST} に書き出しました。")
+    print(f"学習: python 4_train_8n.py {MINED_YAML}")
+    pm.dump("hard_mining")
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="間違えやすい画像から次の学習データを作る")
+    parser.add_argument("--conf", type=float, default=UNCERTAIN_CONF, help="自信がないとする信頼度")
+    parser.add_argument("--margin", type=float, default=UNCERTAIN_MARGIN, help="自信がないとする2位との差")
+    parser.add_argument("--replay", type=float, default=REPLAY_RATIO, help="残りの画像から混ぜる割合")
+    parser.add_argument("--seed", type=int, default=SEED)
+    mine(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
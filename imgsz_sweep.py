@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+license
+GNU Affero General Public License v3（AGPL v3）
+
+推論の画像サイズ (imgsz) ごとの正解率と速さを比べ、使う設定を選びます
+
+学習済みモデルで dataset_l/images/val の画像を、画像サイズ 128/160/224/256/320 で判定し
+(7_all_inference.py と同じ yolo_eval.py の判定)、1枚あたりの時間と正解率を記録します。
+エクスポートした形式 (onnx, openvino など) や CPU スレッド数の組み合わせも比べられます。
+
+・すべての組み合わせ
+・パレート最適な組み合わせ (それより速くて正解率も高い組み合わせがないもの)
+を runs/sweep/sweep_<日時>.json に保存し、パレート最適なものから
+「最も正解率が高いものとの差が --max-drop 以内で一番速いもの」
+(--max-latency を指定した時は「その時間以内で一番正解率が高いもの」) を選んで
+runs/sweep/chosen_<detect|classify>.json に書き出します。
+movie_yolo.py と 7_all_inference.py は、この設定 (モデル・画像サイズ・スレッド数) で推論します
+(config.py の USE_SWEEP = False にすると使いません。モデルを学習し直した時も使いません)。
+
+使い方
+python imgsz_sweep.py
+python imgsz_sweep.py --imgsz 128,224,320 --formats pt,onnx --threads 1,4
+python imgsz_sweep.py --limit 300 --max-drop 0.02
+python imgsz_sweep.py --model runs/classify/train/weights/best.pt
+
+スレッド数は PyTorch (torch.set_num_threads) の設定です。
+onnx などの形式では前処理・後処理だけに効きます。
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import time
+
+from ultralytics import YOLO
+
+import catalog
+import config
+import yolo_eval
+
+# --- 設定 ---
+VAL_DIR = os.path.join(config.LABEL_DIR, 'images', 'val')
+BATCH_SIZE = 1        # 動画と同じく1枚ずつ推論した時の時間を比べる
+MAX_DROP = 0.01       # 最も高い正解率から、この差までは下がってもよい
+SEED = 0
+
+
+def val_rows(conn, limit=None, seed=SEED):
+    """dataset_l/images/val にある画像を {パス: 目録の行} で返す (limit 枚ならクラスごとに均等に選ぶ)"""
+    catalog.ensure_split(conn, 'val', os.path.join(config.TV_DIR, 'images', 'val'))
+    by_class = {}
+    for row in catalog.list_split(conn, 'val'):
+        path = os.path.join(VAL_DIR, row['name'])
+        if row['class'] in config.CLASSES and os.path.exists(path):
+            by_class.setdefault(row['class'], []).append((path, row))
+    if limit:
+        rng = random.Random(seed)
+        per_class = max(1, limit // max(1, len(by_class)))
+        for cls, items in by_class.items():
+            if len(items) > per_class:
+                by_class[cls] = rng.sample(items, per_class)
+    return {path: row for items in by_class.values() for path, row in items}
+
+
+def export_model(source, fmt, imgsz, out_dir):
+    """
+    source を fmt 形式・画像サイズ imgsz でエクスポートする (作成済みなら使い回す)
+    source の隣に書き出すと pipeline.py の export ステージの出力 (best.onnx など) と重なるので、
+    out_dir に置いた重みのコピーからエクスポートする
+    """
+    if fmt == 'pt':
+        return source
+    os.makedirs(out_dir, exist_ok=True)
+    prefix = f"{imgsz}_{fmt}_"
+    for name in os.listdir(out_dir):
+        if name.startswith(prefix) and not name.endswith(".pt"):
+            return os.path.join(out_dir, name)
+    # 拡張子・フォルダ名の末尾で形式が判定されるので、名前の先頭に画像サイズと形式を付ける
+    weights = os.path.join(out_dir, prefix + os.path.basename(source))
+    shutil.copy2(source, weights)
+    try:
+        return str(YOLO(weights).export(format=fmt, imgsz=imgsz, verbose=False))
+    finally:
+        os.remove(weights)
+
+
+def pareto_front(points):
+    """時間が短く正解率が高い、パレート最適な点だけを時間の短い順に返す"""
+    front = []
+    best = -1.0
+    for p in sorted(points, key=lambda p: (p['latency_ms'], -p['accuracy'])):
+        if p['accuracy'] > best:
+            front.append(p)
+            best = p['accuracy']
+    return front
+
+
+def choose(front, max_drop=MAX_DROP, max_latency=None):
+    """パレート最適な点から使う設定を1つ選ぶ"""
+    if max_latency is not None:
+        fast = [p for p in front if p['latency_ms'] <= max_latency]
+        return max(fast, key=lambda p: p['accuracy']) if fast else front[0]
+    best = max(p['accuracy'] for p in front)
+    return next(p for p in front if p['accuracy'] >= best - max_drop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推論の画像サイズごとの正解率と速さの比較")
+    parser.add_argument('--model', default=None, help="学習済みモデル (省略時は config.TASK のモデル)")
+    parser.add_argument('--imgsz', default=",".join(map(str, config.SWEEP_IMGSZ)), help="画像サイズ (カンマ区切り)")
+    parser.add_argument('--formats', default="pt", help="形式 (カンマ区切り 例: pt,onnx,openvino)")
+    parser.add_argument('--threads', default=None, help="CPUスレッド数 (カンマ区切り、省略時は変えない)")
+    parser.add_argument('--batch', type=int, default=BATCH_SIZE)
+    parser.add_argument('--limit', type=int, default=None, help="使う画像数 (省略時は val すべて)")
+    parser.add_argument('--max-drop', type=float, default=MAX_DROP, help="許容する正解率の低下 (0.01 = 1%%)")
+    parser.add_argument('--max-latency', type=float, default=None, help="1枚あたりの時間の上限(ms)")
+    parser.add_argument('--out', default=config.SWEEP_DIR)
+    args = parser.parse_args()
+
+    source = args.model or config.task_model_path()
+    if not os.path.exists(source):
+        print(f"❌ エラー: モデルファイルが見つかりません: {source}")
+        return
+    task = YOLO(source).task
+    source_id = catalog.model_id(source)
+    sizes = [int(s) for s in args.imgsz.split(",")]
+    formats = args.formats.split(",")
+    threads = [int(n) for n in args.threads.split(",")] if args.threads else [None]
+
+    conn = catalog.connect()
+    rows = val_rows(conn, args.limit)
+    conn.close()
+    if not rows:
+        print(f"❌ エラー: 画像がありません: {VAL_DIR} (3_labels.py を先に実行してください)")
+        return
+    print(f"モデル: {source} ({task})  画像: {len(rows)}枚")
+    print("-" * 70)
+
+    points = []
+    for fmt in formats:
+        for imgsz in sizes:
+            try:
+                model_path = export_model(source, fmt, imgsz, os.path.join(args.out, "models", source_id))
+                model = YOLO(model_path, task=task)
+            except Exception as e:
+                print(f"⚠️ {fmt} imgsz={imgsz}: エクスポート・読み込みに失敗しました ({e})")
+                continue
+            for n in threads:
+                yolo_eval.set_threads(n)
+                r = yolo_eval.evaluate(model, rows, args.batch, imgsz=imgsz)
+                point = {'format': fmt, 'imgsz': imgsz, 'threads': n, 'model': model_path, **r}
+                points.append(point)
+                print(f"  {fmt:8s} imgsz={imgsz:4d} threads={str(n):4s}: "
+                      f"{r['latency_ms']:7.2f}ms/枚  正解率 {r['accuracy'] * 100:5.1f}%")
+    if not points:
+        print("❌ エラー: 計測できた組み合わせがありません。")
+        return
+
+    front = pareto_front(points)
+    chosen = choose(front, args.max_drop, args.max_latency)
+    print("-" * 70)
+    print("パレート最適:")
+    for p in front:
+        mark = "👉" if p is chosen else "  "
+        print(f"{mark} {p['format']:8s} imgsz={p['imgsz']:4d} threads={str(p['threads']):4s}: "
+              f"{p['latency_ms']:7.2f}ms/枚  正解率 {p['accuracy'] * 100:5.1f}%")
+
+    os.makedirs(args.out, exist_ok=True)
+    out_path = os.path.join(args.out, f"sweep_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump({'source': source, 'source_id': source_id, 'task': task, 'images': len(rows),
+                   'batch': args.batch, 'points': points, 'pareto': front},
+                  f, ensure_ascii=False, indent=2)
+
+    chosen_path = yolo_eval.chosen_path(task, args.out)
+    with open(chosen_path, 'w', encoding='utf-8') as f:
+        json.dump({'source': source, 'source_id': source_id, 'task': task,
+                   'model': chosen['model'], 'format': chosen['format'], 'imgsz': chosen['imgsz'],
+                   'threads': chosen['threads'], 'accuracy': chosen['accuracy'],
+                   'latency_ms': chosen['latency_ms'], 'sweep': out_path,
+                   'created': time.strftime('%Y-%m-%dT%H:%M:%S')},
+                  f, ensure_ascii=False, indent=2)
+    print(f"保存しました: {out_path}")
+    print(f"🎉 選んだ設定: {chosen_path} ({chosen['format']}, imgsz={chosen['imgsz']}, threads={chosen['threads']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,23 +13,50 @@ WMV (.wmv)
 q 終了
 s フレームをスキップ
 1,2,3 画像サイズ変更
+
+YOLO7_HEADLESS=1 python movie_yolo.py
+とするとウィンドウを出さずに最後まで処理します (ベンチマーク用)
+
+FAST_PATH = True の時は frame_preprocess.py のバッファを使い回す前処理で推論し、
+検出結果を元のフレームに直接描きます (フレームごとの配列の確保・コピーをしない)
+
+imgsz_sweep.py で選んだ設定 (runs/sweep/chosen_detect.json) があれば、
+そのモデル・画像サイズ・スレッド数で推論します
 """
+import os
 from ultralytics import YOLO
 import cv2
 #from picamera2 import Picamera2
 from imutils.video import FPS
 import time 
+import perf_metrics as pm
+import yolo_eval
+
+# ウィンドウを出さずに処理するか (キー入力待ちもしない)
+HEADLESS = os.environ.get("YOLO7_HEADLESS") == "1"
+
+# バッファを使い回す前処理を使うか (False なら model(frame) と results[0].plot())
+FAST_PATH = True
 
 print()
 print("qキーの入力で終了します。")
 time.sleep(1)
 
+# 推論の設定 (imgsz_sweep.py で選んだものがあればそれ、なければ config.py)
+settings = yolo_eval.inference_settings("detect")
+yolo_eval.set_threads(settings['threads'])
+
 # YOLOのモデルを読み込み
-model = YOLO('runs/detect/train/weights/best.pt')
+model = YOLO(settings['model'], task="detect")
+imgsz = settings['imgsz'] or model.overrides.get("imgsz", 640)
 
 model_name = model.ckpt_path # モデルファイルのパス
 print("yoloモデル:",model_name)  
 
+if FAST_PATH:
+    from frame_preprocess import FrameDetector, draw_boxes
+    detector = FrameDetector(settings['model'], imgsz=imgsz)
+
 # 動画ファイルを開く
 video_path = "myMovie.mp4"
 
@@ -38,20 +65,25 @@ print("movie_file:",video_path)
 print()
 
 window_name = model_name + " Movie"
-# ウィンドウを作成（WINDOW_NORMALでリサイズ可能にする）
-cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-# 任意の大きさにリサイズ
-cv2.resizeWindow(window_name, 640, 480)  # 幅640、高さ480
+if not HEADLESS:
+    # ウィンドウを作成（WINDOW_NORMALでリサイズ可能にする）
+    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+    # 任意の大きさにリサイズ
+    cv2.resizeWindow(window_name, 640, 480)  # 幅640、高さ480
+
+# 環境変数 YOLO7_METRICS_PORT があればPrometheus用エンドポイントを起動
+pm.serve_from_env()
 
 # FPS計測開始
 fps = FPS().start()
 while cap.isOpened():
-    ret, frame = cap.read()
+    with pm.stage("decode"):
+        ret, frame = cap.read()
     if not ret:
         break  # 動画終了
 
     # キー入力待ち（qで終了）
-    key = cv2.waitKey(30) & 0xFF  # 下位8ビットを取得
+    key = 0xFF if HEADLESS else cv2.waitKey(30) & 0xFF  # 下位8ビットを取得
     if key == ord("q"):
         # print('**********q')
         break
@@ -66,11 +98,30 @@ while cap.isOpened():
         cv2.resizeWindow(window_name, 640, 480)  # 普通サイズ
     elif key == ord("3"):
         cv2.resizeWindow(window_name, 960, 720) # 大きく
+    elif FAST_PATH:
+        # 前処理したテンソルをそのまま推論に渡す
+        with pm.stage("preprocess"):
+            tensor = detector.preprocess(frame)
+        with pm.stage("inference"):
+            preds = detector.infer(tensor)
+        with pm.stage("postprocess"):
+            xyxy, confidences, class_ids = detector.postprocess(preds)
+
+        # 検出結果をフレームに直接描いて表示
+        with pm.stage("render"):
+            draw_boxes(frame, xyxy, confidences, class_ids, detector.names)
+            if not HEADLESS:
+                cv2.imshow(window_name, frame)
+
+        mask = (confidences >= 0.6)
+        person_count = mask.sum()
+        pm.count("frames")
     else:
         # print('*-------')
         # YOLOで推論（BGR画像そのままでOK）
         # 進行状況バー（tqdm）表示
-        results = model(frame)
+        results = model(frame, imgsz=imgsz)
+        pm.observe_speed(results)
 
         # 進行状況バー（tqdm）非表示
         # 人間だけ検出する 検出するクラスを指定する
@@ -78,9 +129,11 @@ while cap.isOpened():
         # results = model(frame, classes=[0], verbose=False)
 
         # 検出された画像を取得（OpenCV形式のnumpy配列）
-        annotated_frame = results[0].plot()
-        # 表示 ウィンドウのタイトル
-        cv2.imshow(window_name, annotated_frame)
+        with pm.stage("render"):
+            annotated_frame = results[0].plot()
+            # 表示 ウィンドウのタイトル
+            if not HEADLESS:
+                cv2.imshow(window_name, annotated_frame)
 
         # yoloが見つけたクラスの数をターミナルに表示
         boxes = results[0].boxes
@@ -92,13 +145,16 @@ while cap.isOpened():
         mask = (confidences >= 0.6)
         person_count = mask.sum()
         #print("人間",person_count)  
+        pm.count("frames")
     fps.update()
 
 # FPS計測終了
 fps.stop()
 print("[INFO] elapsed time: {:.2f}".format(fps.elapsed()))
 print("[INFO] approx. FPS: {:.2f}".format(fps.fps()))
+pm.dump("movie_yolo")
 
 # 終了処理
 cap.release()
-cv2.destroyAllWindows()
+if not HEADLESS:
+    cv2.destroyAllWindows()
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+license
+GNU Affero General Public License v3（AGPL v3）
+
+各スクリプト共通の計測モジュール
+
+処理の区間(ステージ)ごとの所要時間をヒストグラムとして集計し、
+件数はカウンタとして集計します。
+
+ステージ名の例
+decode      画像・フレームの読み込み(デコード)
+preprocess  推論前の前処理
+inference   推論
+postprocess 推論後の後処理
+render      描画・表示
+io          ファイルの書き込み・コピー・リネーム
+
+使い方
+    import perf_metrics as pm
+
+    with pm.stage("decode"):
+        img = Image.open(path)
+    pm.count("images")
+    pm.dump("0_data2jpeg")   # metrics/0_data2jpeg.json と .csv に保存
+
+動画など長時間動かす場合は
+    YOLO7_METRICS_PORT=9100 python movie_yolo.py
+として起動すると http://localhost:9100/metrics に
+Prometheus形式のテキストを出力します。
+"""
+import bisect
+import csv
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- 設定 ---
+METRICS_DIR = "metrics"               # CSV/JSONの保存先フォルダ
+PORT_ENV = "YOLO7_METRICS_PORT"       # Prometheusエンドポイントのポート番号を指定する環境変数
+METRIC_PREFIX = "yolo7"               # Prometheusのメトリクス名の先頭に付ける文字列
+
+# ヒストグラムのバケット上限(秒)  0.1ms 〜 60秒
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 60.0)
+
+
+class Histogram:
+    """所要時間(秒)のヒストグラム"""
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        # 最後の要素は上限なし(+Inf)のバケット
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def quantile(self, q):
+        """バケットから分位点を線形補間で推定する"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, n in enumerate(self.buckets):
+            upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+            if n and seen + n >= rank:
+                est = lower + (upper - lower) * (rank - seen) / n
+                return min(max(est, self.min), self.max)
+            seen += n
+            lower = upper
+        return self.max
+
+    def summary(self):
+        mean = self.total / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "mean_ms": mean * 1000,
+            "min_ms": (self.min if self.count else 0.0) * 1000,
+            "p50_ms": self.quantile(0.50) * 1000,
+            "p90_ms": self.quantile(0.90) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class _StageTimer:
+    """with文で区間の時間を計るための小さなオブジェクト"""
+    __slots__ = ("metrics", "name", "t0")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class Metrics:
+    """ステージ別ヒストグラムとカウンタの集合"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        return _StageTimer(self, name)
+
+    def observe(self, name, seconds):
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.observe(seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe_speed(self, results):
+        """
+        ultralyticsの推論結果(result.speed ミリ秒)を
+        preprocess / inference / postprocess のヒストグラムに加える
+        """
+        for result in results:
+            speed = getattr(result, "speed", None) or {}
+            for name in ("preprocess", "inference", "postprocess"):
+                ms = speed.get(name)
+                if ms is not None:
+                    self.observe(name, ms / 1000)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "started": self.started,
+                "elapsed_s": time.time() - self.started,
+                "stages": {k: h.summary() for k, h in self.histograms.items()},
+                "counters": dict(self.counters),
+            }
+
+    def export_json(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+    def export_csv(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        snap = self.snapshot()
+        fields = ["stage", "count", "total_s", "mean_ms", "min_ms",
+                  "p50_ms", "p90_ms", "p99_ms", "max_ms"]
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            for name, s in snap["stages"].items():
+                writer.writerow([name] + [s[k] for k in fields[1:]])
+            for name, n in snap["counters"].items():
+                writer.writerow([f"counter:{name}", n] + [""] * (len(fields) - 2))
+
+    def prometheus_text(self):
+        """Prometheusのテキスト形式(exposition format)に変換する"""
+        lines = []
+        name = f"{METRIC_PREFIX}_stage_seconds"
+        lines.append(f"# HELP {name} Stage latency in seconds.")
+        lines.append(f"# TYPE {name} histogram")
+        with self._lock:
+            for stage_name, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for i, upper in enumerate(BUCKETS):
+                    cumulative += h.buckets[i]
+                    lines.append(f'{name}_bucket{{stage="{stage_name}",le="{upper}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage_name}",le="+Inf"}} {h.count}')
+                lines.append(f'{name}_sum{{stage="{stage_name}"}} {h.total}')
+                lines.append(f'{name}_count{{stage="{stage_name}"}} {h.count}')
+            name = f"{METRIC_PREFIX}_events_total"
+            lines.append(f"# HELP {name} Event counters.")
+            lines.append(f"# TYPE {name} counter")
+            for counter_name, n in sorted(self.counters.items()):
+                lines.append(f'{name}{{name="{counter_name}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port):
+        """Prometheus用のHTTPエンドポイントを別スレッドで起動する"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # アクセスログは出さない
+
+        server = ThreadingHTTPServer(("", port), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        return server
+
+
+# --- スクリプトから使う共通インスタンス ---
+METRICS = Metrics()
+
+
+def stage(name):
+    return METRICS.stage(name)
+
+
+def observe(name, seconds):
+    METRICS.observe(name, seconds)
+
+
+def count(name, n=1):
+    METRICS.count(name, n)
+
+
+def observe_speed(results):
+    METRICS.observe_speed(results)
+
+
+def serve_from_env():
+    """環境変数 YOLO7_METRICS_PORT が設定されていればエンドポイントを起動する"""
+    port = os.environ.get(PORT_ENV)
+    if not port:
+        return None
+    server = METRICS.serve(int(port))
+    print(f"📈 メトリクス: http://localhost:{port}/metrics")
+    return server
+
+
+def dump(name, show=True):
+    """metrics/<name>.json と metrics/<name>.csv に書き出し、概要を表示する"""
+    json_path = os.path.join(METRICS_DIR, name + ".json")
+    csv_path = os.path.join(METRICS_DIR, name + ".csv")
+    METRICS.export_json(json_path)
+    METRICS.export_csv(csv_path)
+    if show:
+        snap = METRICS.snapshot()
+        print(f"\n--- 計測結果 ({name}) ---")
+        for stage_name, s in snap["stages"].items():
+            print(f"  {stage_name:12s}: {s['count']:6d}回  平均={s['mean_ms']:8.2f}ms  "
+                  f"p90={s['p90_ms']:8.2f}ms  合計={s['total_s']:7.2f}秒")
+        for counter_name, n in snap["counters"].items():
+            print(f"  {counter_name:12s}: {n}")
+        print(f"  保存先: {json_path} / {csv_path}")
+    return json_path
@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+"""
+license
+GNU Affero General Public License v3（AGPL v3）
+
+0〜7 の手順をまとめて実行するスクリプト
+
+各ステージの入力と出力の指紋(フォルダはファイル名・サイズ・更新時刻、ファイルは内容、
+スクリプト、そのステージが使う config.py の設定の値)を
+.pipeline_state.json に記録し、変化があったステージだけを実行し直します。
+(config.py の EXPORT_FORMAT を変えた時は export だけ、のように、
+ 変えた設定を使うステージとその後ろだけが実行し直しになります)
+依存関係のないステージは同時に実行します。
+  ・0_data2jpeg.py + 1_dataset_name_cut.py はクラスごとに並列
+  ・7_all_inference.py とモデルのエクスポートは並列
+
+data/ ─┬─ jpeg:bike ─┐
+       ├─ jpeg:cars ─┤
+       └─ ...       ─┴─ 2_data2train_val ─ 3_labels ─┐
+                          config.py ─ data_yaml ─────┴─ 4_train ─┬─ 7_all_inference ─ hard_mining
+                                                                  └─ export
+(config.TRAIN_DATA = SUBSET_YAML の時は 3_labels ─ subset ─ 4_train)
+(config.TASK = "classify" の時は 3_labels〜4_train の代わりに
+ 2_data2train_val ─ 3_cls_dataset ─ 4_train_cls ─┬─ 7_all_inference
+                                                 └─ export
+ hard_mining は検出モデルの学習データを作るので実行しません)
+
+5_detect.py, 6_random_inference.py, movie_yolo.py は画面表示があるので対象外です。
+
+使い方
+python pipeline.py               # 必要なステージだけ実行
+python pipeline.py --dry-run     # 実行が必要なステージを表示するだけ
+python pipeline.py --force 4_train
+python pipeline.py 3_labels      # 3_labels とその前のステージだけ
+python pipeline.py -j 4          # 同時実行数
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import config
+import yolo_eval
+
+# --- 設定 ---
+STATE_FILE = ".pipeline_state.json"   # 指紋の記録ファイル
+LOG_DIR = "logs"                      # 各ステージの出力ログ
+JOBS = os.cpu_count() or 2            # 同時実行数の初期値
+
+EXPORT_CODE = ("from ultralytics import YOLO; import config; "
+               "YOLO(config.task_model_path()).export(format=config.EXPORT_FORMAT, "
+               "imgsz=config.CLS_IMGSZ if config.TASK == 'classify' else config.TRAIN_IMGSZ)")
+DATA_YAML_CODE = "import config; config.write_data_yaml()"
+CATALOG_SETTINGS = ["CATALOG_PATH", "CLASSES"]   # catalog.py が使う設定
+
+
+class Stage:
+    """パイプラインの1ステージ"""
+
+    def __init__(self, name, commands, inputs=(), outputs=(), deps=(), scripts=(), settings=()):
+        self.name = name
+        self.commands = commands    # 順番に実行するコマンド(引数のリスト)のリスト
+        self.inputs = list(inputs)  # 入力ファイル・フォルダ
+        self.outputs = list(outputs)
+        self.deps = list(deps)      # 先に終わっている必要のあるステージ名
+        self.scripts = list(scripts)
+        self.settings = list(settings)  # 使う config.py の設定の名前 (関数なら中身のコード)
+
+
+def python(script, *args):
+    return [sys.executable, script, *args]
+
+
+def detect_stages():
+    """検出モード: 3_labels ─ (subset) ─ 4_train"""
+    stages = []
+    # dataset_l 直下にはサブセットのリストなどを置くので、images と labels だけを指紋にする
+    label_dirs = [os.path.join(config.LABEL_DIR, "images"), os.path.join(config.LABEL_DIR, "labels")]
+    stages.append(Stage(
+        "3_labels", [python("3_labels.py")],
+        inputs=[config.TV_DIR], outputs=label_dirs,
+        deps=["2_data2train_val"], scripts=["3_labels.py"],
+        settings=CATALOG_SETTINGS + ["TV_DIR", "LABEL_DIR", "SPLITS", "class_ids"],
+    ))
+    stages.append(Stage(
+        "data_yaml", [[sys.executable, "-c", DATA_YAML_CODE]],
+        outputs=[config.DATA_YAML],
+        settings=["CLASSES", "DATA_YAML", "LABEL_DIR", "write_data_yaml"],
+    ))
+    train_deps = ["3_labels", "data_yaml"]
+    train_inputs = label_dirs + [config.TRAIN_DATA]
+    if config.TRAIN_DATA == config.SUBSET_YAML:
+        # サブセットで学習する時だけ、学習速度の記録から枚数を決めてリストを作る
+        stages.append(Stage(
+            "subset", [python("subset_sampler.py")],
+            inputs=label_dirs + [config.THROUGHPUT_FILE], outputs=[config.SUBSET_LIST, config.SUBSET_YAML],
+            deps=["3_labels"], scripts=["subset_sampler.py"],
+            settings=CATALOG_SETTINGS + ["LABEL_DIR", "SUBSET_LIST", "SUBSET_YAML", "SUBSET_IMAGES",
+                                         "SUBSET_MINUTES", "THROUGHPUT_FILE", "TRAIN_EPOCHS", "TRAIN_IMGSZ",
+                                         "write_data_yaml"],
+        ))
+        train_deps.append("subset")
+        train_inputs.append(config.SUBSET_LIST)
+    stages.append(Stage(
+        "4_train", [python("4_train_8n.py", config.TRAIN_DATA)],
+        inputs=train_inputs, outputs=[config.MODEL_PATH],
+        deps=train_deps, scripts=["4_train_8n.py"],
+        settings=["TRAIN_MODEL", "TRAIN_EPOCHS", "TRAIN_IMGSZ", "TRAIN_PROJECT", "TRAIN_NAME",
+                  "TRAIN_DATA", "THROUGHPUT_FILE"],
+    ))
+    return stages
+
+
+def build_stages():
+    """config.py の設定からステージのDAGを作る"""
+    stages = []
+    jpeg_names = []
+    for class_name in config.CLASSES:
+        name = f"jpeg:{class_name}"
+        jpeg_names.append(name)
+        stages.append(Stage(
+            name,
+            [python("0_data2jpeg.py", class_name), python("1_dataset_name_cut.py", class_name)],
+            inputs=[os.path.join(config.DATA_DIR, class_name)],
+            outputs=[os.path.join(config.JPEG_DIR, class_name)],
+            scripts=["0_data2jpeg.py", "1_dataset_name_cut.py"],
+            settings=["DATA_DIR", "JPEG_DIR"],
+        ))
+    stages.append(Stage(
+        "2_data2train_val", [python("2_data2train_val.py")],
+        inputs=[config.JPEG_DIR], outputs=[config.TV_DIR],
+        deps=jpeg_names, scripts=["2_data2train_val.py"],
+        settings=CATALOG_SETTINGS + ["JPEG_DIR", "TV_DIR"],
+    ))
+    if config.TASK == "classify":
+        # 分類モード: ラベル・data.yaml は使わず、クラスごとのフォルダから学習する
+        stages.append(Stage(
+            "3_cls_dataset", [python("3_cls_dataset.py")],
+            inputs=[config.TV_DIR], outputs=[config.CLS_DIR],
+            deps=["2_data2train_val"], scripts=["3_cls_dataset.py"],
+            settings=CATALOG_SETTINGS + ["TV_DIR", "CLS_DIR", "SPLITS"],
+        ))
+        stages.append(Stage(
+            "4_train_cls", [python("4_train_cls.py")],
+            inputs=[config.CLS_DIR], outputs=[config.CLS_MODEL_PATH],
+            deps=["3_cls_dataset"], scripts=["4_train_cls.py"],
+            settings=["CLS_MODEL", "TRAIN_EPOCHS", "CLS_IMGSZ", "CLS_PROJECT", "TRAIN_NAME", "CLS_DIR"],
+        ))
+    else:
+        stages.extend(detect_stages())
+    # 評価・エクスポートするのは config.TASK のモデル
+    model_path = config.task_model_path()
+    train_stage = "4_train_cls" if config.TASK == "classify" else "4_train"
+    # imgsz_sweep.py で選んだ設定があれば 7_all_inference.py と hard_mining.py はそれで推論する
+    infer_inputs = [model_path, os.path.join(config.TV_DIR, "images", "val")]
+    mining_inputs = [model_path, os.path.join(config.TV_DIR, "images", "train")]
+    if config.USE_SWEEP:
+        infer_inputs.append(yolo_eval.chosen_path())
+        mining_inputs.append(yolo_eval.chosen_path())
+    stages.append(Stage(
+        "7_all_inference", [python("7_all_inference.py")],
+        inputs=infer_inputs,
+        deps=[train_stage], scripts=["7_all_inference.py", "yolo_eval.py"],
+        settings=CATALOG_SETTINGS + ["TASK", "TV_DIR", "INFER_IMGSZ", "USE_SWEEP", "SWEEP_DIR", "task_model_path"],
+    ))
+    # hard_mining.py が書き出すのは検出モデル用のリスト (dataset_l の画像) なので分類モードでは使わない
+    if config.TASK != "classify":
+        stages.append(Stage(
+            "hard_mining", [python("hard_mining.py")],
+            inputs=mining_inputs,
+            outputs=[config.MINED_LIST, config.MINED_YAML],
+            deps=["7_all_inference"], scripts=["hard_mining.py", "yolo_eval.py", "subset_sampler.py"],
+            settings=CATALOG_SETTINGS + ["TASK", "TV_DIR", "LABEL_DIR", "MINED_LIST", "MINED_YAML",
+                                         "INFER_IMGSZ", "USE_SWEEP", "SWEEP_DIR",
+                                         "task_model_path", "write_data_yaml"],
+        ))
+    stages.append(Stage(
+        "export", [[sys.executable, "-c", EXPORT_CODE]],
+        inputs=[model_path],
+        outputs=[os.path.splitext(model_path)[0] + "." + config.EXPORT_FORMAT],
+        deps=[train_stage],
+        settings=["TASK", "EXPORT_FORMAT", "TRAIN_IMGSZ", "CLS_IMGSZ", "task_model_path"],
+    ))
+    return {s.name: s for s in stages}
+
+
+# ==============================
+# 指紋
+# ==============================
+def _walk(path):
+    """
+    フォルダ以下のファイルを (相対パス, サイズ, 更新時刻) で列挙する
+    ultralytics が学習中に作る *.cache は含めない
+    """
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        with os.scandir(current) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif not entry.name.endswith(".cache"):
+                    st = entry.stat()
+                    yield os.path.relpath(entry.path, path), st.st_size, st.st_mtime_ns
+
+
+def fingerprint_path(path):
+    """ファイル・フォルダの指紋 (存在しなければ None)"""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha1()
+    if not os.path.isdir(path):
+        # ファイルは内容で比べる (同じ内容で書き直されただけなら変化なし)
+        return fingerprint_file_content(path)
+    for rel, size, mtime in sorted(_walk(path)):
+        h.update(f"{rel}\0{size}\0{mtime}\n".encode("utf-8", "surrogateescape"))
+    return h.hexdigest()
+
+
+def fingerprint_file_content(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def fingerprint_setting(name):
+    """config.py の設定の値 (関数ならコード) を文字列にする"""
+    value = getattr(config, name)
+    return inspect.getsource(value) if callable(value) else repr(value)
+
+
+def stage_fingerprint(stage):
+    """ステージの入力側の指紋 (入力データ・スクリプト・使う設定・コマンド)"""
+    return {
+        "inputs": {p: fingerprint_path(p) for p in stage.inputs},
+        "code": {p: fingerprint_file_content(p) for p in stage.scripts},
+        "settings": {name: fingerprint_setting(name) for name in stage.settings},
+        "commands": [" ".join(c[1:]) for c in stage.commands],
+    }
+
+
+def outputs_fingerprint(stage):
+    return {p: fingerprint_path(p) for p in stage.outputs}
+
+
+def stale_reason(stage, state):
+    """実行し直す理由を返す (最新なら None)"""
+    record = state.get(stage.name)
+    if record is None:
+        return "未実行"
+    if record.get("input") != stage_fingerprint(stage):
+        return "入力が変化"
+    outputs = outputs_fingerprint(stage)
+    if any(fp is None for fp in outputs.values()):
+        return "出力がない"
+    if record.get("output") != outputs:
+        return "出力が変化"
+    return None
+
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {}
+    with open(STATE_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state):
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, STATE_FILE)
+
+
+# ==============================
+# 実行
+# ==============================
+def run_commands(stage):
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = os.path.join(LOG_DIR, stage.name.replace(":", "_") + ".log")
+    t0 = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        for cmd in stage.commands:
+            proc = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT)
+            if proc.returncode != 0:
+                return False, time.perf_counter() - t0, log_path
+    return True, time.perf_counter() - t0, log_path
+
+
+def select_stages(stages, targets):
+    """指定したステージと、その前に必要なステージを集める"""
+    if not targets:
+        return set(stages)
+    selected = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in stages:
+            raise SystemExit(f"❌ エラー: ステージ '{name}' はありません。{', '.join(stages)}")
+        if name not in selected:
+            selected.add(name)
+            stack.extend(stages[name].deps)
+    return selected
+
+
+def run_pipeline(targets=(), force=(), jobs=JOBS, dry_run=False):
+    stages = build_stages()
+    selected = select_stages(stages, targets)
+    state = load_state()
+
+    pending = set(selected)
+    done = set()       # 成功 or 最新
+    failed = set()
+    planned = set()    # --dry-run で実行予定になったステージ
+    running = {}
+
+    print(f"ステージ数: {len(pending)}  同時実行数: {jobs}")
+    print("-" * 50)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            # 依存先が全部終わったステージを開始する
+            for name in sorted(pending):
+                stage = stages[name]
+                deps = [d for d in stage.deps if d in selected]
+                if any(d in failed for d in deps):
+                    print(f"  ⏭️  {name}: 前のステージが失敗したのでスキップ")
+                    pending.discard(name)
+                    failed.add(name)
+                    continue
+                if not all(d in done for d in deps):
+                    continue
+                pending.discard(name)
+                if name in force:
+                    reason = "強制実行"
+                elif any(d in planned for d in deps):
+                    reason = "前のステージを実行予定"
+                else:
+                    reason = stale_reason(stage, state)
+                if reason is None:
+                    print(f"  ✅ {name}: 最新")
+                    done.add(name)
+                    continue
+                if dry_run:
+                    print(f"  🔄 {name}: 実行が必要 ({reason})")
+                    planned.add(name)
+                    done.add(name)
+                    continue
+                print(f"  ▶️  {name}: 開始 ({reason})")
+                running[pool.submit(run_commands, stage)] = name
+
+            if not running:
+                if pending and not any(all(d in done or d in failed for d in stages[n].deps if d in selected)
+                                       for n in pending):
+                    raise SystemExit(f"❌ エラー: 依存関係を解決できません: {', '.join(sorted(pending))}")
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                ok, elapsed, log_path = future.result()
+                if ok:
+                    stage = stages[name]
+                    state[name] = {
+                        "input": stage_fingerprint(stage),
+                        "output": outputs_fingerprint(stage),
+                        "elapsed_s": elapsed,
+                        "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    }
+                    save_state(state)
+                    done.add(name)
+                    print(f"  🎉 {name}: 完了 ({elapsed:.1f}秒)")
+                else:
+                    failed.add(name)
+                    print(f"  ❌ {name}: 失敗 ({elapsed:.1f}秒)  ログ: {log_path}")
+
+    print("-" * 50)
+    if failed:
+        print(f"❌ 失敗したステージ: {', '.join(sorted(failed))}")
+        return False
+    print("🎉 パイプラインが完了しました。")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="0〜7の手順を必要な分だけ実行する")
+    parser.add_argument("targets", nargs="*", help="実行するステージ (省略時はすべて)")
+    parser.add_argument("--force", nargs="+", default=[], help="最新でも実行するステージ")
+    parser.add_argument("-j", "--jobs", type=int, default=JOBS, help="同時実行数")
+    parser.add_argument("--dry-run", action="store_true", help="実行が必要なステージを表示するだけ")
+    args = parser.parse_args()
+    ok = run_pipeline(args.targets, set(args.force), args.jobs, args.dry_run)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
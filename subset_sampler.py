@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+license
+GNU Affero General Public License v3（AGPL v3）
+
+学習用のサブセットを作ります (クラスごとの枚数をそろえる)
+
+dataset_l の学習画像をすべて使うと、お試し設定でも2,30分かかります。
+ここでは画像をコピーせずに
+  dataset_l/subset_train.txt   学習に使う画像のリスト
+  data_subset.yaml             上のリストを train に指定した data.yaml
+を作ります。
+
+枚数は
+  --images 700         枚数を直接指定
+  --minutes 5          学習時間の目標から決める
+のどちらかで決めます。学習時間から決める場合は 4_train_8n.py が
+runs/throughput.json に記録した 1秒あたりの学習画像数と、1エポックあたりの検証などの時間を使い、
+目標の時間から検証などの時間を引いた残りで学習できる枚数にします。
+学習のたびに測り直す速度の小さな揺れで枚数が変わらないように、
+前回のリストとの差が BUDGET_TOLERANCE 以内なら前回と同じ枚数にします。
+
+使い方
+python subset_sampler.py --minutes 5
+python 4_train_8n.py data_subset.yaml
+"""
+import argparse
+import json
+import os
+import random
+
+import catalog
+import config
+
+# --- 設定 ---
+# 学習速度の記録がない時に使う値 (1秒あたりの画像数、ラズパイのCPUでの目安)
+DEFAULT_IMAGES_PER_SEC = 10.0
+BUDGET_TOLERANCE = 0.1   # 学習時間から決めた枚数が前回とこの割合以内の差なら前回の枚数を使う
+SEED = 0
+
+
+def training_speed(imgsz):
+    """
+    4_train_8n.py が記録した (1秒あたりの学習画像数, 1エポックあたりの検証などの秒数) を読む
+    (同じ画像サイズの記録がなければ一番近いもの)
+    """
+    if not os.path.exists(config.THROUGHPUT_FILE):
+        return None
+    with open(config.THROUGHPUT_FILE, encoding="utf-8") as f:
+        throughput = json.load(f)
+    if not throughput:
+        return None
+    key = min(throughput, key=lambda k: abs(int(k) - imgsz))
+    ips = throughput[key]["images_per_sec"]
+    overhead = throughput[key].get("overhead_s_per_epoch", 0.0)
+    if int(key) != imgsz:
+        # 画像サイズが違う場合は画素数に比例すると考えて換算する
+        scale = (imgsz / int(key)) ** 2
+        ips /= scale
+        overhead *= scale
+    return ips, overhead
+
+
+def budget_images(minutes, epochs, imgsz):
+    """学習時間の目標から画像数を求める (検証などの時間は学習画像の枚数で変わらないので先に引く)"""
+    speed = training_speed(imgsz)
+    if speed is None:
+        print(f"⚠️ 警告: 学習速度の記録 ({config.THROUGHPUT_FILE}) がありません。"
+              f"{DEFAULT_IMAGES_PER_SEC} 枚/秒として計算します。")
+        speed = (DEFAULT_IMAGES_PER_SEC, 0.0)
+    ips, overhead = speed
+    train_s = minutes * 60 - overhead * epochs
+    if train_s <= 0:
+        print(f"⚠️ 警告: 検証などの時間 ({overhead * epochs:.0f}秒) だけで {minutes}分を超えます。")
+        train_s = 0
+    n = max(int(train_s * ips / epochs), len(config.CLASSES))   # 各クラス1枚は使う
+    print(f"学習速度 {ips:.1f} 枚/秒, 検証など {overhead:.1f}秒/エポック, {epochs}エポック, {minutes}分 → {n}枚")
+    return n
+
+
+def balanced_quota(available, total):
+    """
+    クラスごとの枚数を決める (なるべく同じ枚数、足りないクラスの分は他のクラスに回す)
+    available: {クラス名: 使える枚数}
+    """
+    quota = {cls: 0 for cls in available}
+    remaining = total
+    open_classes = [cls for cls in available if available[cls] > 0]
+    while remaining > 0 and open_classes:
+        share = max(remaining // len(open_classes), 1)
+        for cls in list(open_classes):
+            take = min(share, available[cls] - quota[cls], remaining)
+            quota[cls] += take
+            remaining -= take
+            if quota[cls] >= available[cls]:
+                open_classes.remove(cls)
+            if remaining == 0:
+                break
+    return quota
+
+
+def previous_count(list_path=config.SUBSET_LIST):
+    """前回作ったリストの枚数 (なければ None)"""
+    if not os.path.exists(list_path):
+        return None
+    with open(list_path, encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def labeled_ids(conn, split, cls):
+    """3_labels.py でラベルを作った画像のid"""
+    return [r[0] for r in conn.execute(
+        "SELECT id FROM images WHERE split = ? AND class = ?"
+        " AND EXISTS (SELECT 1 FROM labels WHERE labels.image_id = images.id)", (split, cls))]
+
+
+def write_list(names, list_path=config.SUBSET_LIST, yaml_path=config.SUBSET_YAML):
+    """
+    画像リストと、それを train に指定した data.yaml を書き出す
+    パスは ./images/train/... (リストファイルのフォルダからの相対パス) で書く
+    """
+    os.makedirs(os.path.dirname(list_path) or ".", exist_ok=True)
+    with open(list_path, "w", encoding="utf-8") as f:
+        for name in names:
+            f.write(f"./images/train/{name}\n")
+    config.write_data_yaml(yaml_path, train=f"./{list_path}")
+    return list_path, yaml_path
+
+
+def build_subset(n_images, seed=SEED):
+    conn = catalog.connect()
+    rng = random.Random(seed)
+
+    ids_by_class = {cls: labeled_ids(conn, 'train', cls) for cls in config.CLASSES}
+    available = {cls: len(v) for cls, v in ids_by_class.items()}
+    if sum(available.values()) == 0:
+        print("❌ エラー: 目録にラベル付きの学習画像がありません。2_data2train_val.py と 3_labels.py を先に実行してください。")
+        return None
+
+    quota = balanced_quota(available, n_images)
+    chosen = []
+    for cls in config.CLASSES:
+        picked = rng.sample(ids_by_class[cls], quota[cls])
+        chosen.extend(r['name'] for r in catalog.get(conn, picked))
+        print(f"  {cls:10s}: {quota[cls]:5d} / {available[cls]:5d}枚")
+    conn.close()
+
+    chosen.sort()
+    list_path, yaml_path = write_list(chosen)
+    print("-" * 40)
+    print(f"🎉 {len(chosen)}枚のサブセットを作りました: {list_path}")
+    print(f"学習: python 4_train_8n.py {yaml_path}")
+    return chosen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="クラスごとの枚数をそろえた学習用サブセットを作る")
+    parser.add_argument("--images", type=int, default=config.SUBSET_IMAGES, help="目標の画像数")
+    parser.add_argument("--minutes", type=float, default=config.SUBSET_MINUTES, help="目標の学習時間(分)")
+    parser.add_argument("--epochs", type=int, default=config.TRAIN_EPOCHS, help="学習のエポック数")
+    parser.add_argument("--imgsz", type=int, default=config.TRAIN_IMGSZ, help="学習の画像サイズ")
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    if args.images:
+        n = args.images
+    else:
+        n = budget_images(args.minutes, args.epochs, args.imgsz)
+        prev = previous_count()
+        if prev and abs(n - prev) <= prev * BUDGET_TOLERANCE:
+            print(f"前回の枚数 {prev}枚との差が小さいので、前回と同じ枚数にします。")
+            n = prev
+    build_subset(n, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+license
+GNU Affero General Public License v3（AGPL v3）
+
+画像1枚につき1クラスを判定する推論 (7_all_inference.py と hard_mining.py で共通)
+
+画像をまとめて(バッチで) model.predict に渡し、
+検出モデルなら最も信頼度が高い検出のクラスを、
+分類モデル (yolov8n-cls など) なら1位のクラスを、その画像の判定結果とします。
+
+imgsz_sweep.py で選んだ推論の設定 (モデル・画像サイズ・スレッド数) も
+inference_settings() で読み込みます (movie_yolo.py と 7_all_inference.py で使います)。
+"""
+import json
+import os
+import time
+
+import catalog
+import config
+import perf_metrics as pm
+
+BATCH_SIZE = 16   # 1回の predict に渡す画像の枚数
+
+
+def top1(result, names):
+    """
+    1枚分の推論結果から (予測クラス名, 信頼度, 2位との差) を返す
+    何も検出されなければ ("none", 0.0, 0.0)
+    2位との差は、1位と別のクラスで最も信頼度が高い検出との差 (小さいほど迷っている)
+    """
+    probs = getattr(result, "probs", None)
+    if probs is not None:
+        # 分類モデル: 1位と2位のクラスの確率
+        top5 = probs.top5conf.cpu().numpy()
+        best_conf = float(top5[0])
+        second = float(top5[1]) if len(top5) > 1 else 0.0
+        return names[probs.top1].lower(), best_conf, best_conf - second
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return "none", 0.0, 0.0
+    confs = boxes.conf.cpu().numpy()
+    cls_ids = boxes.cls.cpu().numpy().astype(int)
+    max_idx = confs.argmax()
+    best_cls = cls_ids[max_idx]
+    best_conf = float(confs[max_idx])
+    others = confs[cls_ids != best_cls]
+    second = float(others.max()) if len(others) else 0.0
+    return names[best_cls].lower(), best_conf, best_conf - second
+
+
+def predict_top1(model, paths, batch_size=BATCH_SIZE, metrics=None, **predict_args):
+    """
+    画像のパスのリストをバッチで推論し、(パス, 予測クラス名, 信頼度, 2位との差) を順に返す
+    読み込めない画像は予測クラス名を None にして返す
+    時間は metrics (perf_metrics.Metrics、省略時はスクリプト全体の計測) に記録する
+    """
+    metrics = pm.METRICS if metrics is None else metrics
+    paths = list(paths)
+    for i in range(0, len(paths), batch_size):
+        chunk = paths[i:i + batch_size]
+        try:
+            with metrics.stage("predict"):
+                results = model.predict(chunk, batch=len(chunk), verbose=False, **predict_args)
+        except Exception as e:
+            # バッチの中に壊れた画像があると全体が失敗するので1枚ずつやり直す
+            if len(chunk) == 1:
+                print(f"⚠️ エラー: {chunk[0]} -> {e}")
+                metrics.count("errors")
+                yield chunk[0], None, 0.0, 0.0
+                continue
+            yield from predict_top1(model, chunk, 1, metrics, **predict_args)
+            continue
+        metrics.observe_speed(results)
+        for path, result in zip(chunk, results):
+            yield (path, *top1(result, model.names))
+
+
+def evaluate(model, rows, batch_size=BATCH_SIZE, **predict_args):
+    """
+    rows ({パス: 目録の行}) をすべて判定し、速度と正解率を返す
+    前処理・推論・後処理の時間は、このモデルの分だけを別に集計する
+    """
+    paths = list(rows)
+    # ウォームアップ (モデルの準備の時間を含めない)
+    for _ in predict_top1(model, paths[:batch_size], batch_size, pm.Metrics(), **predict_args):
+        pass
+
+    metrics = pm.Metrics()
+    correct = total = 0
+    per_class = {}
+    t0 = time.perf_counter()
+    for path, pred, conf, margin in predict_top1(model, paths, batch_size, metrics, **predict_args):
+        cls = rows[path]['class']
+        c = per_class.setdefault(cls, [0, 0])
+        total += 1
+        c[1] += 1
+        if pred == cls.lower():
+            correct += 1
+            c[0] += 1
+    elapsed = time.perf_counter() - t0
+
+    stages = metrics.snapshot()['stages']
+    return {
+        'images': total,
+        'elapsed_s': elapsed,
+        'images_per_sec': total / elapsed if elapsed > 0 else 0.0,
+        'latency_ms': elapsed / total * 1000 if total else 0.0,
+        'speed_ms': {name: stages[name]['mean_ms']
+                     for name in ('preprocess', 'inference', 'postprocess') if name in stages},
+        'accuracy': correct / total if total else 0.0,
+        'per_class': {cls: c[0] / c[1] for cls, c in sorted(per_class.items())},
+    }
+
+
+def set_threads(n):
+    """PyTorch の CPU スレッド数を変える (None なら変えない)"""
+    if n:
+        import torch
+        torch.set_num_threads(int(n))
+
+
+def chosen_path(task=None, sweep_dir=None):
+    """imgsz_sweep.py で選んだ設定のファイル"""
+    return os.path.join(sweep_dir or config.SWEEP_DIR, f"chosen_{task or config.TASK}.json")
+
+
+def inference_settings(task=None):
+    """
+    推論に使う {model, imgsz, threads, model_id} を返す
+    imgsz_sweep.py で選んだ設定があり、それが今の学習済みモデルから作られたものならそれを使う
+    なければ config.py の設定 (imgsz が None ならモデルの学習時の画像サイズ)
+    model_id はエクスポートしたモデルを使う時も元の学習済みモデル(.pt)のID
+    (判定結果を目録に記録する時に使う。None なら model から求める)
+    """
+    model_path = config.task_model_path(task)
+    settings = {'model': model_path, 'imgsz': config.INFER_IMGSZ, 'threads': None, 'model_id': None}
+    path = chosen_path(task)
+    if not config.USE_SWEEP or not os.path.exists(path) or not os.path.exists(model_path):
+        return settings
+    with open(path, encoding="utf-8") as f:
+        chosen = json.load(f)
+    if chosen.get('source_id') != catalog.model_id(model_path):
+        print(f"⚠️ 警告: {path} は以前のモデルの設定なので使いません (imgsz_sweep.py をやり直してください)")
+        return settings
+    if not os.path.exists(chosen['model']):
+        print(f"⚠️ 警告: {path} のモデルが見つかりません: {chosen['model']}")
+        return settings
+    print(f"推論の設定: {path} ({chosen['format']}, imgsz={chosen['imgsz']}, threads={chosen['threads']})")
+    return {'model': chosen['model'], 'imgsz': chosen['imgsz'], 'threads': chosen['threads'],
+            'model_id': chosen['source_id']}
+
+
+def record_id(settings):
+    """
+    inference_settings() の設定で判定した結果を目録に記録する時のID
+    画像サイズが変わると判定も変わるので、指定した時は '<モデルのID>@<画像サイズ>' にする
+    (7_all_inference.py と hard_mining.py で同じIDになり、設定を変えた時は推論し直す)
+    """
+    model_id = settings['model_id'] or catalog.model_id(settings['model'])
+    return f"{model_id}@{settings['imgsz']}" if settings['imgsz'] else model_id